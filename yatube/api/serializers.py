@@ -0,0 +1,162 @@
+"""
+Представление объектов в JSON API.
+
+Только поля самих объектов и уже подгруженных через select_related
+связей: сериализация не делает запросов. Картинка отдаётся ссылкой
+на оригинал с размерами из метаданных, без поиска миниатюр.
+"""
+
+
+def serialize_user(user):
+    return {
+        'username': user.username,
+        'full_name': user.get_full_name(),
+    }
+
+
+def serialize_group(group):
+    return {
+        'slug': group.slug,
+        'title': group.title,
+        'description': group.description,
+        'post_count': group.post_count,
+    }
+
+
+def serialize_image(post):
+    if not post.image:
+        return None
+    return {
+        'url': post.image.url,
+        'width': post.image_width,
+        'height': post.image_height,
+    }
+
+
+# Поле поста: колонки для only() и функция, достающая значение.
+# Поля связей записываются через точку и попадают во вложенный объект.
+POST_FIELDS = {
+    'id': ((), lambda post: post.pk),
+    'text': (('text',), lambda post: post.text),
+    'pub_date': (('pub_date',), lambda post: post.pub_date.isoformat()),
+    'author.username': (
+        ('author__username',), lambda post: post.author.username
+    ),
+    'author.full_name': (
+        ('author__first_name', 'author__last_name'),
+        lambda post: post.author.get_full_name()
+    ),
+    'group.slug': (('group__slug',), lambda post: post.group.slug),
+    'group.title': (('group__title',), lambda post: post.group.title),
+    'comment_count': (
+        ('comment_count',), lambda post: post.comment_count
+    ),
+    'image': (('image', 'image_width', 'image_height'), serialize_image),
+}
+
+
+class PostFields:
+    """
+    Поля поста, которые запросил клиент (?fields=id,text,author.username).
+
+    Читаются только колонки этих полей и только нужные связи,
+    сериализуются только эти поля. Имя связи (author, group) означает
+    все её поля. Без fields отдаются все поля.
+    """
+
+    def __init__(self, names=None):
+        if not names:
+            self.names = list(POST_FIELDS)
+            return
+        wanted = set()
+        for name in names:
+            matched = [
+                field for field in POST_FIELDS
+                if field == name or field.startswith(f'{name}.')
+            ]
+            if not matched:
+                raise ValueError(f'Неизвестное поле: {name}')
+            wanted.update(matched)
+        self.names = [name for name in POST_FIELDS if name in wanted]
+
+    @classmethod
+    def parse(cls, value):
+        return cls([name for name in (value or '').split(',') if name])
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def relations(self):
+        return list(dict.fromkeys(
+            name.partition('.')[0] for name in self.names if '.' in name
+        ))
+
+    def apply(self, queryset, columns=()):
+        """Выборка только нужных колонок; columns — то, что нужно
+        самому запросу (например, ключ курсора)."""
+        relations = self.relations()
+        only = set(columns) | set(relations)
+        for name in self.names:
+            only.update(POST_FIELDS[name][0])
+        if relations:
+            # select_related() без аргументов тянет все связи.
+            queryset = queryset.select_related(*relations)
+        return queryset.only(*only)
+
+    def serialize(self, post):
+        data = {}
+        for name in self.names:
+            getter = POST_FIELDS[name][1]
+            relation, _, attr = name.rpartition('.')
+            if not relation:
+                data[name] = getter(post)
+            elif getattr(post, f'{relation}_id') is None:
+                data[relation] = None
+            else:
+                data.setdefault(relation, {})[attr] = getter(post)
+        return data
+
+
+def serialize_post(post):
+    return PostFields().serialize(post)
+
+
+def serialize_comment(comment):
+    return {
+        'id': comment.pk,
+        'text': comment.text,
+        'pub_date': comment.pub_date.isoformat(),
+        'author': (
+            None if comment.author_id is None
+            else serialize_user(comment.author)
+        ),
+    }
+
+
+def serialize_profile(author, stats):
+    return {
+        **serialize_user(author),
+        'posts': stats.posts,
+        'followers': stats.followers,
+        'following': stats.following,
+    }
+
+
+def serialize_page(request, page, serialize):
+    """Объекты страницы и ссылки на соседние страницы по курсору."""
+    def link(cursor):
+        if cursor is None:
+            return None
+        # fields и прочие параметры переходят на соседние страницы.
+        params = request.GET.copy()
+        params.pop('page', None)
+        params['cursor'] = cursor
+        return request.build_absolute_uri(
+            f'{request.path}?{params.urlencode()}'
+        )
+
+    return {
+        'results': [serialize(obj) for obj in page.object_list],
+        'next': link(page.next_cursor),
+        'previous': link(page.previous_cursor),
+    }
@@ -0,0 +1,276 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='api_author', first_name='Иван', last_name='Петров'
+        )
+        cls.reader = User.objects.create_user(username='api_reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='api-group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {i}'
+            )
+            for i in range(12)
+        ]
+        cls.post = cls.posts[-1]
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий'
+        )
+        Follow.objects.follow(cls.reader.pk, cls.author.pk)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = self.client_class()
+        self.reader_client.force_login(self.reader)
+
+    def test_post_lists(self):
+        """Списки повторяют страницы сайта и листаются курсором."""
+        urls = {
+            reverse('api:index'): self.client,
+            reverse('api:group_list', args=(self.group.slug,)): self.client,
+            reverse('api:profile', args=(self.author.username,)):
+                self.client,
+            reverse('api:follow_index'): self.reader_client,
+        }
+        for url, client in urls.items():
+            with self.subTest(url=url):
+                data = client.get(url).json()
+                self.assertEqual(len(data['results']), 10)
+                self.assertEqual(data['results'][0]['id'], self.post.pk)
+                self.assertIsNone(data['previous'])
+                rest = client.get(data['next']).json()
+                self.assertEqual(
+                    [post['id'] for post in rest['results']],
+                    [self.posts[1].pk, self.posts[0].pk]
+                )
+                self.assertIsNone(rest['next'])
+
+    def test_post_fields(self):
+        data = self.client.get(
+            reverse('api:post_detail', args=(self.post.pk,))
+        ).json()
+        self.assertEqual(data['post'], {
+            'id': self.post.pk,
+            'text': self.post.text,
+            'pub_date': self.post.pub_date.isoformat(),
+            'author': {'username': 'api_author', 'full_name': 'Иван Петров'},
+            'group': {'slug': 'api-group', 'title': 'Группа'},
+            'comment_count': 1,
+            'image': None,
+        })
+        self.assertEqual(
+            [c['text'] for c in data['comments']['results']], ['Комментарий']
+        )
+
+    def test_profile_and_group(self):
+        profile = self.client.get(
+            reverse('api:profile', args=(self.author.username,))
+        ).json()['profile']
+        self.assertEqual(
+            (profile['posts'], profile['followers'], profile['following']),
+            (12, 1, 0)
+        )
+        group = self.client.get(
+            reverse('api:group_list', args=(self.group.slug,))
+        ).json()['group']
+        self.assertEqual(group['post_count'], 12)
+
+    def test_errors(self):
+        self.assertEqual(
+            self.client.get(reverse('api:follow_index')).status_code, 401
+        )
+        self.assertEqual(
+            self.client.get(reverse('api:profile', args=('nobody',)))
+            .status_code,
+            404
+        )
+        self.assertEqual(
+            self.client.post(reverse('api:index')).status_code, 405
+        )
+
+    def test_list_queries(self):
+        self.client.get(reverse('api:index'))
+        with self.assertNumQueries(1):
+            self.client.get(reverse('api:index'), {'page': 2})
+
+    def test_not_modified_without_queries(self):
+        url = reverse('api:post_detail', args=(self.post.pk,))
+        etag = self.client.get(url)['ETag']
+        self.assertFalse(etag.startswith('W/'))
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_etag_changes_with_data(self):
+        def comment():
+            Comment.objects.create(
+                post=self.post, author=self.author, text='ещё'
+            )
+
+        def post():
+            Post.objects.create(author=self.reader, text='новый')
+
+        def follow():
+            Follow.objects.follow(self.author.pk, self.reader.pk)
+
+        def rename_group():
+            self.group.title = 'Новое название'
+            self.group.save()
+
+        cases = (
+            (reverse('api:post_detail', args=(self.post.pk,)), comment),
+            (reverse('api:index'), post),
+            (reverse('api:profile', args=(self.author.username,)), follow),
+            (reverse('api:group_list', args=(self.group.slug,)),
+             rename_group),
+        )
+        for url, change in cases:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                change()
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+
+    def test_follow_fields(self):
+        data = self.reader_client.get(
+            reverse('api:follow_index'), {'fields': 'id,author.username'}
+        ).json()
+        self.assertEqual(
+            data['results'][0],
+            {'id': self.post.pk, 'author': {'username': 'api_author'}}
+        )
+
+    def test_follow_etag_per_user(self):
+        url = reverse('api:follow_index')
+        etag = self.reader_client.get(url)['ETag']
+        other = self.client_class()
+        other.force_login(self.author)
+        self.assertEqual(
+            other.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200
+        )
+
+
+class SparseFieldsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='sf_author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='sf-group', description=''
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='С группой'
+        )
+        cls.lonely = Post.objects.create(author=cls.author, text='Без')
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_batch_by_ids(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = self.get(
+                reverse('api:index'),
+                ids=f'{self.lonely.pk},0,{self.post.pk},{self.lonely.pk}',
+                fields='id,text,author.username',
+            )
+        self.assertEqual(len(queries), 1)
+        sql = queries[0]['sql']
+        self.assertIn('"auth_user"."username"', sql)
+        self.assertNotIn('"posts_post"."image"', sql)
+        self.assertNotIn('"auth_user"."first_name"', sql)
+        self.assertNotIn('posts_group', sql)
+        self.assertEqual(data['results'], [
+            {'id': self.lonely.pk, 'text': 'Без',
+             'author': {'username': 'sf_author'}},
+            {'id': self.post.pk, 'text': 'С группой',
+             'author': {'username': 'sf_author'}},
+        ])
+
+    def test_relation_name_selects_all_its_fields(self):
+        data = self.get(
+            reverse('api:index'), ids=f'{self.post.pk},{self.lonely.pk}',
+            fields='group'
+        )
+        self.assertEqual(data['results'], [
+            {'group': {'slug': 'sf-group', 'title': 'Группа'}},
+            {'group': None},
+        ])
+
+    def test_fields_on_lists(self):
+        # Группе нужен запрос группы, профилю — счётчиков и автора.
+        urls = {
+            reverse('api:index'): 1,
+            reverse('api:group_list', args=(self.group.slug,)): 2,
+            reverse('api:profile', args=(self.author.username,)): 3,
+        }
+        for url, queries in urls.items():
+            with self.subTest(url=url), self.assertNumQueries(queries):
+                data = self.get(url, fields='text')
+                self.assertEqual(data['results'][0], {'text': 'С группой'}
+                                 if 'group' in url else {'text': 'Без'})
+        post = self.get(
+            reverse('api:post_detail', args=(self.post.pk,)),
+            fields='comment_count'
+        )['post']
+        self.assertEqual(post, {'comment_count': 0})
+
+    def test_cursor_without_key_fields(self):
+        data = self.get(reverse('api:index'), fields='text')
+        self.assertIsNone(data['next'])
+        Post.objects.bulk_create(
+            Post(author=self.author, text=str(i)) for i in range(10)
+        )
+        cache.clear()
+        data = self.get(reverse('api:index'), fields='text')
+        rest = self.client.get(data['next']).json()['results']
+        self.assertEqual(rest, [{'text': 'Без'}, {'text': 'С группой'}])
+
+    def test_comment_count_in_list_etag(self):
+        url = reverse('api:index')
+        counted = self.client.get(url, {'fields': 'comment_count'})['ETag']
+        plain = self.client.get(url, {'fields': 'text'})['ETag']
+        Comment.objects.create(post=self.post, author=self.author, text='к')
+        self.assertEqual(
+            self.client.get(
+                url, {'fields': 'comment_count'},
+                HTTP_IF_NONE_MATCH=counted
+            ).status_code,
+            200
+        )
+        self.assertEqual(
+            self.client.get(
+                url, {'fields': 'text'}, HTTP_IF_NONE_MATCH=plain
+            ).status_code,
+            304
+        )
+
+    def test_bad_requests(self):
+        for params in (
+            {'fields': 'id,password'},
+            {'ids': '1,x'},
+            {'ids': ','.join(map(str, range(1, 102)))},
+        ):
+            with self.subTest(params=params):
+                response = self.client.get(reverse('api:index'), params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('detail', response.json())
@@ -0,0 +1,181 @@
+"""
+Read-only JSON API: те же данные, что на страницах posts.views, без
+рендера шаблонов и миниатюр.
+
+Списки листаются курсором (?cursor=, см. core.pagination), посты по
+списку id отдаются пачкой (?ids=1,2,3), а ?fields= оставляет в ответе
+и в запросе к базе только нужные поля постов.
+
+Каждый ответ несёт сильный ETag из версий кэша (core.cache), которые
+меняются вместе с данными. ETag считается до выборки: на совпавший
+If-None-Match отвечаем 304, не трогая базу (профилю нужен один запрос
+счётчиков) и ничего не сериализуя.
+"""
+from functools import wraps
+
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import condition, require_GET
+
+from core.cache import (
+    COMMENT_COUNTS, POST_LIST, comment_list, follow_list, version_etag
+)
+from core.pagination import CursorPaginator
+from core.utils import paginate
+from posts.counters import stats_for
+from posts.models import Group, Post, User, UserStats
+from posts.timeline import timeline_page
+from posts.views import comment_page
+
+from .serializers import (PostFields, serialize_comment, serialize_group,
+                          serialize_page, serialize_profile)
+
+POSTS_PER_PAGE = 10
+# Больше id за раз не принимаем: запрос и ответ должны оставаться малыми
+BATCH_SIZE = 100
+
+
+def bad_request(message):
+    return JsonResponse({'detail': str(message)}, status=400)
+
+
+def login_required(view):
+    """Вместо редиректа на форму входа — 401."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse(
+                {'detail': 'Требуется авторизация'}, status=401
+            )
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def with_post_fields(view):
+    """Разбирает ?fields= и передаёт PostFields во view и в функцию
+    ETag аргументом fields; на неизвестное поле — 400."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            fields = PostFields.parse(request.GET.get('fields'))
+        except ValueError as error:
+            return bad_request(error)
+        return view(request, *args, fields=fields, **kwargs)
+    return wrapper
+
+
+def post_namespaces(fields):
+    """Версии, от которых зависят поля постов в списке."""
+    namespaces = [POST_LIST]
+    if 'comment_count' in fields:
+        namespaces.append(COMMENT_COUNTS)
+    return namespaces
+
+
+def post_list_etag(request, fields, **kwargs):
+    return version_etag(request, *post_namespaces(fields))
+
+
+def profile_etag(request, fields, username):
+    stats = UserStats.objects.filter(user__username=username).values_list(
+        'posts', 'followers', 'following'
+    ).first()
+    if stats is None:
+        return None
+    return version_etag(request, *post_namespaces(fields), extra=stats)
+
+
+def post_detail_etag(request, fields, post_id):
+    return version_etag(request, POST_LIST, comment_list(post_id))
+
+
+def follow_etag(request, fields):
+    return version_etag(
+        request, *post_namespaces(fields), follow_list(request.user.pk),
+        extra=(request.user.pk,)
+    )
+
+
+def post_page(request, post_list, fields):
+    # Колонки ключа курсора нужны пагинатору, даже если их не просили.
+    post_list = fields.apply(post_list, CursorPaginator.key)
+    page = paginate(request, post_list, POSTS_PER_PAGE)
+    return serialize_page(request, page, fields.serialize)
+
+
+def parse_ids(value):
+    ids = list(dict.fromkeys(int(pk) for pk in value.split(',') if pk))
+    if len(ids) > BATCH_SIZE:
+        raise ValueError(f'Не больше {BATCH_SIZE} id за запрос')
+    return ids
+
+
+def post_batch(request, fields):
+    """Посты по списку id одним запросом, в порядке списка;
+    несуществующие id пропускаются."""
+    try:
+        ids = parse_ids(request.GET['ids'])
+    except ValueError as error:
+        return bad_request(error)
+    posts = fields.apply(Post.objects.all()).in_bulk(ids)
+    return JsonResponse({
+        'results': [fields.serialize(posts[pk]) for pk in ids if pk in posts]
+    })
+
+
+@require_GET
+@with_post_fields
+@condition(etag_func=post_list_etag)
+def index(request, fields):
+    if 'ids' in request.GET:
+        return post_batch(request, fields)
+    return JsonResponse(post_page(request, Post.objects.all(), fields))
+
+
+@require_GET
+@with_post_fields
+@condition(etag_func=post_list_etag)
+def group_posts(request, fields, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return JsonResponse({
+        'group': serialize_group(group),
+        **post_page(request, Post.objects.filter(group=group), fields),
+    })
+
+
+@require_GET
+@with_post_fields
+@condition(etag_func=profile_etag)
+def profile(request, fields, username):
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    return JsonResponse({
+        'profile': serialize_profile(author, stats_for(author)),
+        **post_page(request, Post.objects.filter(author=author), fields),
+    })
+
+
+@require_GET
+@with_post_fields
+@condition(etag_func=post_detail_etag)
+def post_detail(request, fields, post_id):
+    post = get_object_or_404(fields.apply(Post.objects.all()), pk=post_id)
+    return JsonResponse({
+        'post': fields.serialize(post),
+        'comments': serialize_page(
+            request, comment_page(request, post.pk), serialize_comment
+        ),
+    })
+
+
+@require_GET
+@login_required
+@with_post_fields
+@condition(etag_func=follow_etag)
+def follow_index(request, fields):
+    page = timeline_page(
+        request, request.user, POSTS_PER_PAGE,
+        posts=fields.apply(Post.objects.all())
+    )
+    return JsonResponse(serialize_page(request, page, fields.serialize))
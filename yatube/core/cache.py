@@ -0,0 +1,119 @@
+"""
+Счётчики версий для инвалидации кэша.
+
+Ключи кэшированных фрагментов включают версию пространства имён;
+при изменении данных версия увеличивается, и старые фрагменты просто
+перестают запрашиваться и вытесняются по TTL. Поэтому TTL можно делать
+длинным, не рискуя показать устаревшую страницу.
+
+Сами версии живут settings.CACHE_VERSION_TIMEOUT: истёкшая версия
+начинается заново с текущего времени, это просто сбрасывает кэш. Так
+версия, которую не увидел другой процесс (см. CACHES), не живёт вечно.
+"""
+import hashlib
+import math
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# Всё, что показывается в списках постов: посты, группы, имена авторов
+POST_LIST = 'post_list'
+# Число комментариев постов (в HTML-списках не показывается)
+COMMENT_COUNTS = 'comment_counts'
+
+
+def follow_list(user_id):
+    """Лента подписок пользователя меняется ещё и от его подписок."""
+    return f'follow_list:{user_id}'
+
+
+def follow_suggestions(user_id):
+    """Рекомендации «Кого почитать» пользователя."""
+    return f'follow_suggestions:{user_id}'
+
+
+def comment_list(post_id):
+    """Комментарии поста и их число."""
+    return f'comment_list:{post_id}'
+
+
+def version_key(namespace):
+    return f'version:{namespace}'
+
+
+def changed_key(namespace):
+    return f'changed:{namespace}'
+
+
+def get_version(namespace):
+    key = version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        # Стартуем со времени, а не с 1: после вытеснения ключа версии
+        # номера не должны совпасть со старыми закэшированными фрагментами.
+        cache.add(
+            key, int(time.time() * 1000), settings.CACHE_VERSION_TIMEOUT
+        )
+        # Когда данные менялись на самом деле, неизвестно; «сейчас» —
+        # безопасная оценка для Last-Modified.
+        cache.add(
+            changed_key(namespace), time.time(),
+            settings.CACHE_VERSION_TIMEOUT
+        )
+        version = cache.get(key)
+    return version
+
+
+def bump_version(namespace):
+    """Увеличивает версию сразу и ещё раз после коммита транзакции:
+    фрагмент, отрисованный параллельным запросом по ещё не закоммиченным
+    данным, не переживёт коммит."""
+    incr_version(namespace)
+    transaction.on_commit(lambda: incr_version(namespace))
+
+
+def incr_version(namespace):
+    cache.set(
+        changed_key(namespace), time.time(), settings.CACHE_VERSION_TIMEOUT
+    )
+    try:
+        return cache.incr(version_key(namespace))
+    except ValueError:
+        return get_version(namespace)
+
+
+def last_changed(*namespaces):
+    """Когда последний раз менялась версия одного из пространств имён;
+    None, если это неизвестно (версия не менялась или вытеснена).
+    Время округляется вверх до секунды: Last-Modified точнее не бывает,
+    и изменение в ту же секунду после ответа не должно дать 304."""
+    keys = [changed_key(namespace) for namespace in namespaces]
+    found = cache.get_many(keys)
+    if len(found) < len(keys):
+        return None
+    return datetime.fromtimestamp(
+        math.ceil(max(found.values())), tz=timezone.utc
+    )
+
+
+def fragment_cache_context(*namespaces):
+    """Контекст для {% cache cache_timeout ... cache_version %}."""
+    return {
+        'cache_timeout': settings.POST_LIST_CACHE_TIMEOUT,
+        'cache_version': '.'.join(
+            str(get_version(namespace)) for namespace in namespaces
+        ),
+    }
+
+
+def version_etag(request, *namespaces, extra=()):
+    """Сильный ETag ответа по адресу запроса, версиям пространств имён
+    и значениям extra. Пока данные не менялись, ETag совпадает с прошлым,
+    и посчитать его можно, не читая и не сериализуя сами данные."""
+    parts = [request.get_full_path()]
+    parts += [str(get_version(namespace)) for namespace in namespaces]
+    parts += [str(value) for value in extra]
+    return hashlib.sha1('\n'.join(parts).encode()).hexdigest()
@@ -0,0 +1,203 @@
+import heapq
+from itertools import islice
+from types import MethodType
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+FORWARD = 'n'
+BACKWARD = 'p'
+COUNT_ERROR = (
+    'Keyset-пагинатор не считает объекты и не знает номеров страниц: '
+    'используйте cursor_page() и курсоры страницы.'
+)
+
+
+def cursor_has_next(page):
+    return page.next_cursor is not None
+
+
+def cursor_has_previous(page):
+    return page.previous_cursor is not None
+
+
+def no_page_number(page):
+    raise NotImplementedError(COUNT_ERROR)
+
+
+class CursorPaginator(Paginator):
+    """
+    Keyset-пагинатор по ключу (pub_date, pk).
+
+    Страница выбирается условием «ключ меньше ключа последнего показанного
+    объекта», поэтому не нужны ни COUNT(*), ни OFFSET, и сотая страница
+    стоит столько же, сколько первая. Курсор — непрозрачная строка
+    с направлением и значениями ключа. Унаследованные от Paginator
+    count, num_pages и page(number) молча делали бы те самые COUNT(*)
+    и OFFSET, поэтому они выбрасывают NotImplementedError.
+    """
+    key = ('pub_date', 'pk')
+
+    def __init__(self, object_list, per_page, key=None):
+        super().__init__(object_list, per_page)
+        if key is not None:
+            self.key = tuple(key)
+
+    def _check_object_list_is_ordered(self):
+        # Порядок всегда задаётся ключом курсора, см. ordering().
+        pass
+
+    @property
+    def count(self):
+        raise NotImplementedError(COUNT_ERROR)
+
+    num_pages = page_range = count
+
+    def page(self, number):
+        raise NotImplementedError(COUNT_ERROR)
+
+    get_page = validate_number = page
+
+    def get_key(self, obj):
+        return tuple(getattr(obj, name) for name in self.key)
+
+    def encode_cursor(self, obj, direction=FORWARD):
+        values = [self.serialize_value(value) for value in self.get_key(obj)]
+        raw = '|'.join([direction] + values)
+        return urlsafe_base64_encode(force_bytes(raw))
+
+    def decode_cursor(self, cursor):
+        """Возвращает (direction, values) или (FORWARD, None) для
+        пустого или испорченного курсора."""
+        if not cursor:
+            return FORWARD, None
+        try:
+            direction, *raw = urlsafe_base64_decode(cursor).decode().split('|')
+            if direction not in (FORWARD, BACKWARD):
+                raise ValueError(cursor)
+            if len(raw) != len(self.key):
+                raise ValueError(cursor)
+            values = [
+                self.parse_value(name, value)
+                for name, value in zip(self.key, raw)
+            ]
+        except (ValueError, ValidationError):
+            return FORWARD, None
+        return direction, values
+
+    def serialize_value(self, value):
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return str(value)
+
+    def parse_value(self, name, value):
+        opts = self.object_list.model._meta
+        field = opts.pk if name == 'pk' else opts.get_field(name)
+        return field.to_python(value)
+
+    def ordering(self, direction=FORWARD):
+        prefix = '-' if direction == FORWARD else ''
+        return [prefix + name for name in self.key]
+
+    def keyset_filter(self, values, direction=FORWARD):
+        """(k1, k2) < (v1, v2) превращается в
+        k1 < v1 OR (k1 = v1 AND k2 < v2)."""
+        lookup = 'lt' if direction == FORWARD else 'gt'
+        condition = Q()
+        for i, name in enumerate(self.key):
+            equal = dict(zip(self.key[:i], values[:i]))
+            equal[f'{name}__{lookup}'] = values[i]
+            condition |= Q(**equal)
+        return condition
+
+    def fetch(self, values, direction, limit):
+        """Достаёт до limit объектов после ключа values в направлении
+        direction. Наследники могут подменить источник данных."""
+        queryset = self.object_list
+        if values is not None:
+            queryset = queryset.filter(self.keyset_filter(values, direction))
+        return list(queryset.order_by(*self.ordering(direction))[:limit])
+
+    def cursor_page(self, cursor=None):
+        direction, values = self.decode_cursor(cursor)
+        objects = self.fetch(values, direction, self.per_page + 1)
+        has_more = len(objects) > self.per_page
+        objects = objects[:self.per_page]
+        if direction == BACKWARD:
+            if not has_more:
+                # Дошли до начала ленты: отдаём полноценную первую страницу.
+                return self.cursor_page()
+            objects.reverse()
+            return self.build_page(objects, None, cursor, True, True)
+        return self.build_page(
+            objects, 1 if values is None else None, cursor,
+            has_more, values is not None
+        )
+
+    def number_page(self, number):
+        """Старые ссылки вида ?page=N: один запрос с OFFSET, без COUNT(*).
+        Дальше навигация идёт уже по курсорам."""
+        try:
+            number = max(int(number), 1)
+        except (TypeError, ValueError):
+            number = 1
+        bottom = (number - 1) * self.per_page
+        queryset = self.object_list.order_by(*self.ordering())
+        objects = list(queryset[bottom:bottom + self.per_page + 1])
+        has_more = len(objects) > self.per_page
+        return self.build_page(
+            objects[:self.per_page], number, None, has_more, number > 1
+        )
+
+    def build_page(self, objects, number, cursor, has_next, has_previous):
+        # Шаблоны и тесты проекта ждут именно Page, поэтому методы,
+        # которые Page считает от номера, подменяются у экземпляра.
+        # number известен только для первой страницы и ?page=N.
+        page = Page(objects, number, self)
+        page.has_next = MethodType(cursor_has_next, page)
+        page.has_previous = MethodType(cursor_has_previous, page)
+        page.next_page_number = MethodType(no_page_number, page)
+        page.previous_page_number = MethodType(no_page_number, page)
+        page.cursor = cursor or ''
+        page.next_cursor = page.previous_cursor = None
+        if objects and has_next:
+            page.next_cursor = self.encode_cursor(objects[-1])
+        if objects and has_previous:
+            page.previous_cursor = self.encode_cursor(objects[0], BACKWARD)
+        return page
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """
+    Keyset-пагинатор поверх нескольких источников с общим ключом.
+
+    Каждый источник — пара (queryset, key); строки источника приводятся
+    к кортежам значений ключа через values_list(*key). Каждый источник
+    отдаёт не больше limit строк после курсора, страница собирается
+    k-way слиянием.
+    """
+
+    def __init__(self, sources, per_page):
+        self.sources = [
+            CursorPaginator(queryset.values_list(*key), per_page, key=key)
+            for queryset, key in sources
+        ]
+        first = self.sources[0]
+        super().__init__(first.object_list, per_page, key=first.key)
+
+    def get_key(self, obj):
+        return obj
+
+    def fetch(self, values, direction, limit):
+        rows = [
+            source.fetch(values, direction, limit) for source in self.sources
+        ]
+        merged = heapq.merge(*rows, reverse=direction == FORWARD)
+        return list(islice(merged, limit))
+
+    def number_page(self, number):
+        # Смещение по нескольким источникам не посчитать одним запросом.
+        return self.cursor_page()
@@ -1,7 +1,15 @@
-from django.core.paginator import Paginator
+from .pagination import CursorPaginator
 
 
-def paginate(request, post_list, num):
-    paginator = Paginator(post_list, num)
+def paginate(request, post_list, num, key=None):
+    return page_from_request(
+        request, CursorPaginator(post_list, num, key=key)
+    )
+
+
+def page_from_request(request, paginator):
+    cursor = request.GET.get('cursor')
     page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+    if cursor is None and page_number is not None:
+        return paginator.number_page(page_number)
+    return paginator.cursor_page(cursor)
@@ -1,5 +1,7 @@
 from django.contrib import admin
 
+from search.backend import filter_matching, match_expression
+
 from .models import Group, Post
 
 
@@ -17,6 +19,12 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Ищем по полнотекстовому индексу, а не LIKE '%...%' по таблице.
+        if not match_expression(search_term):
+            return queryset, False
+        return filter_matching(queryset, search_term), False
+
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
@@ -0,0 +1,61 @@
+"""
+Кэш отрисованных карточек постов для всех списков.
+
+Карточка поста одинакова на главной, в группе, в профиле и в ленте
+подписок, поэтому она рендерится один раз и кэшируется по ключу
+(pk, версия). Страница списка забирает все свои карточки одним
+cache.get_many и рендерит шаблон только для промахов, миниатюры для них
+находятся одним пакетом.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.template.loader import render_to_string
+
+from core.cache import get_version
+
+from .thumbnails import resolve_thumbnails
+
+CARD_TEMPLATE = 'includes/post_card.html'
+# Версия карточек: меняется, когда меняются группы или имена авторов
+POST_CARDS = 'post_cards'
+
+
+def card_key(post_id, version):
+    return f'post_card:{post_id}:{version}'
+
+
+def render_cards(posts):
+    """Возвращает HTML карточек posts в исходном порядке."""
+    posts = list(posts)
+    version = get_version(POST_CARDS)
+    keys = [card_key(post.pk, version) for post in posts]
+    cached = cache.get_many(keys)
+    thumbnails = resolve_thumbnails(
+        post for post, key in zip(posts, keys) if key not in cached
+    )
+    rendered = {}
+    cards = []
+    for post, key in zip(posts, keys):
+        card = cached.get(key)
+        if card is None:
+            thumbnail = thumbnails.get(post.pk)
+            card = render_to_string(
+                CARD_TEMPLATE, {'post': post, 'thumbnail': thumbnail}
+            )
+            # Пока нарезаны не все варианты, карточку не кэшируем:
+            # иначе она сутки показывала бы неполный srcset.
+            if not post.image or (thumbnail and thumbnail.complete):
+                rendered[key] = card
+        cards.append(card)
+    if rendered:
+        cache.set_many(rendered, settings.POST_CARD_CACHE_TIMEOUT)
+    return cards
+
+
+def invalidate_card(post_id):
+    """Сбрасывает карточку поста сейчас и ещё раз после коммита."""
+    def delete():
+        cache.delete(card_key(post_id, get_version(POST_CARDS)))
+    delete()
+    transaction.on_commit(delete)
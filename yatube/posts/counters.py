@@ -0,0 +1,119 @@
+"""
+Денормализованные счётчики: посты автора и группы, комментарии поста,
+подписчики и подписки пользователя.
+
+Счётчики меняются атомарным UPDATE ... SET n = n + 1 в той же транзакции,
+что и сохранение/удаление считаемой строки, поэтому страницы поста
+и профиля обходятся без агрегирующих запросов. Команда recount
+пересчитывает всё заново, если счётчики разошлись с данными.
+"""
+from django.db.models import (Count, F, IntegerField, OuterRef, Q,
+                              Subquery)
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+def bump(queryset, **deltas):
+    # Не уводим счётчик в минус, даже если он уже разошёлся с данными.
+    queryset = queryset.filter(**{
+        f'{field}__gte': -delta
+        for field, delta in deltas.items() if delta < 0
+    })
+    return queryset.update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+
+
+def bump_user(user_id, **deltas):
+    if not bump(UserStats.objects.filter(user_id=user_id), **deltas):
+        if any(delta > 0 for delta in deltas.values()):
+            # Строки ещё нет (пользователь старше счётчиков) — считаем честно.
+            refresh_user_stats(user_id)
+
+
+def bump_group(group_id, delta):
+    if group_id is not None:
+        bump(Group.objects.filter(pk=group_id), post_count=delta)
+
+
+def bump_post(post_id, delta):
+    if post_id is not None:
+        bump(Post.objects.filter(pk=post_id), comment_count=delta)
+
+
+def stats_for(user):
+    """Счётчики пользователя без лишнего запроса, если они уже
+    подгружены через select_related('stats')."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return refresh_user_stats(user.pk)
+
+
+def refresh_user_stats(user_id):
+    stats, _ = UserStats.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            'posts': Post.objects.filter(author_id=user_id).count(),
+            'followers': Follow.objects.filter(author_id=user_id).count(),
+            'following': Follow.objects.filter(user_id=user_id).count(),
+        },
+    )
+    return stats
+
+
+def counted(model, field):
+    """Подзапрос «сколько строк model ссылается через field на pk».
+    У UserStats первичный ключ — это user_id."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(n=Count('pk')).values('n'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def repair(queryset, **counters):
+    """Исправляет строки, где счётчики разошлись с данными.
+    Возвращает число исправленных строк."""
+    actual = {f'actual_{field}': value for field, value in counters.items()}
+    stale = queryset.annotate(**actual)
+    drift = None
+    for field in counters:
+        condition = ~Q(**{field: F(f'actual_{field}')})
+        drift = condition if drift is None else drift | condition
+    pks = list(stale.filter(drift).values_list('pk', flat=True))
+    if pks:
+        queryset.filter(pk__in=pks).update(**counters)
+    return len(pks)
+
+
+def recount():
+    """Пересчитывает все счётчики. Возвращает число исправленных строк
+    по каждой таблице."""
+    UserStats.objects.bulk_create(
+        [
+            UserStats(user_id=pk) for pk in User.objects.filter(
+                stats__isnull=True
+            ).values_list('pk', flat=True)
+        ],
+        ignore_conflicts=True,
+    )
+    return {
+        'users': repair(
+            UserStats.objects.all(),
+            posts=counted(Post, 'author'),
+            followers=counted(Follow, 'author'),
+            following=counted(Follow, 'user'),
+        ),
+        'groups': repair(
+            Group.objects.all(), post_count=counted(Post, 'group')
+        ),
+        'posts': repair(
+            Post.objects.all(), comment_count=counted(Comment, 'post')
+        ),
+    }
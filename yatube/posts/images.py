@@ -0,0 +1,189 @@
+"""
+Приём и метаданные картинок постов.
+
+Загрузка нормализуется до сохранения: JPEG декодируется сразу
+в уменьшенном масштабе (draft), картинка поворачивается по EXIF,
+ужимается до settings.IMAGE_MAX_SIDE и пересохраняется без EXIF. В памяти
+не бывает полного декодированного кадра с телефонной камеры, а на диск
+ложится файл в несколько раз меньше.
+
+Ширина, высота и формат оригинала читаются из заголовка файла один раз,
+пока загруженный файл ещё в памяти, и хранятся в строке поста. Шаблонам
+и нарезке миниатюр не нужно открывать оригинал, чтобы узнать его размер.
+Там же считается заглушка — картинка в пару десятков пикселей в виде
+data: URI, которую шаблон показывает, пока грузится миниатюра.
+"""
+import base64
+import math
+import os
+from io import BytesIO
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image, ImageOps
+
+# Форматы, которые сохраняются как есть; остальные перекодируются
+KEPT_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'GIF': '.gif', 'WEBP': '.webp'}
+# Форматы, где несколько кадров — анимация. У MPO (фото с телефона
+# со вторым кадром-превью) is_animated тоже истинно, но это фото.
+ANIMATED_FORMATS = ('GIF', 'PNG', 'WEBP')
+# Как повернуть картинку по тегу Orientation, см. ImageOps.exif_transpose
+ORIENTATIONS = {
+    2: Image.FLIP_LEFT_RIGHT,
+    3: Image.ROTATE_180,
+    4: Image.FLIP_TOP_BOTTOM,
+    5: Image.TRANSPOSE,
+    6: Image.ROTATE_270,
+    7: Image.TRANSVERSE,
+    8: Image.ROTATE_90,
+}
+
+METADATA_FIELDS = (
+    'image_width', 'image_height', 'image_format', 'image_placeholder'
+)
+
+
+def make_placeholder(image):
+    """Кадр карточки размером в IMAGE_PLACEHOLDER_WIDTH пикселей
+    в виде data: URI; браузер растягивает его, и он выглядит размытым."""
+    width, height = settings.POST_THUMBNAIL_SIZE
+    placeholder_width = settings.IMAGE_PLACEHOLDER_WIDTH
+    size = (
+        placeholder_width, max(1, round(placeholder_width * height / width))
+    )
+    image.draft('RGB', size)
+    image = ImageOps.exif_transpose(image)
+    image = ImageOps.fit(image.convert('RGB'), size, Image.BILINEAR)
+    buffer = BytesIO()
+    image.save(buffer, 'PNG', optimize=True)
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/png;base64,{encoded}'
+
+
+def read_metadata(file):
+    """Возвращает (width, height, format, placeholder).
+
+    Размер и формат берутся из заголовка без декодирования пикселей;
+    для заглушки JPEG декодируется в масштабе 1/8.
+    """
+    file.seek(0)
+    with Image.open(file) as image:
+        width, height = image.size
+        image_format = image.format or ''
+        placeholder = make_placeholder(image)
+    file.seek(0)
+    return width, height, image_format, placeholder
+
+
+def set_metadata(post, metadata=(None, None, '', '')):
+    (
+        post.image_width, post.image_height,
+        post.image_format, post.image_placeholder
+    ) = metadata
+
+
+def update_metadata(post):
+    """Заполняет метаданные для только что загруженной картинки.
+
+    Уже сохранённый файл не трогаем: его метаданные записаны при загрузке
+    или командой image_metadata.
+    """
+    if not post.image:
+        set_metadata(post)
+    elif not post.image._committed:
+        set_metadata(post, read_metadata(post.image.file))
+
+
+def has_metadata(post):
+    return post.image_width is not None
+
+
+def fitted_size(size, max_side):
+    ratio = min(max_side / size[0], max_side / size[1], 1)
+    return (
+        max(1, math.ceil(size[0] * ratio)),
+        max(1, math.ceil(size[1] * ratio)),
+    )
+
+
+def output_format(image):
+    if image.format in KEPT_FORMATS:
+        return image.format
+    has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+    return 'PNG' if has_alpha else 'JPEG'
+
+
+def normalize_upload(upload):
+    """Возвращает загрузку, готовую к сохранению.
+
+    Слишком большие по числу пикселей картинки отклоняются до
+    декодирования. Файл без EXIF, не превышающий IMAGE_MAX_SIDE,
+    в знакомом формате возвращается без перекодирования; анимации
+    не трогаются. От MPO остаётся первый кадр в JPEG.
+    """
+    upload.seek(0)
+    image = Image.open(upload)
+    width, height = image.size
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Картинка слишком большая: %(width)s×%(height)s пикселей.',
+            code='too_many_pixels',
+            params={'width': width, 'height': height},
+        )
+    target = fitted_size(image.size, settings.IMAGE_MAX_SIDE)
+    image_format = output_format(image)
+    animated = (
+        image.format in ANIMATED_FORMATS
+        and getattr(image, 'is_animated', False)
+    )
+    if animated or (
+        target == image.size
+        and 'exif' not in image.info
+        and image_format == image.format
+    ):
+        upload.seek(0)
+        return upload
+    # Ориентацию читаем до декодирования: после load() некоторые
+    # форматы (TIFF) закрывают файл, и EXIF из него уже не прочитать.
+    orientation = image.getexif().get(0x0112)
+    # JPEG сразу декодируется с уменьшением в 2, 4 или 8 раз. Поворачиваем
+    # уже уменьшенную картинку: рамка квадратная, результат тот же.
+    image.draft('RGB', target)
+    # TIFF Pillow поворачивает сам, прямо в load(), и размер меняется:
+    # грузим до thumbnail, иначе он считает рамку по старому размеру.
+    image.load()
+    if image.format == 'TIFF':
+        orientation = None
+    image.thumbnail(
+        (settings.IMAGE_MAX_SIDE, settings.IMAGE_MAX_SIDE), Image.LANCZOS
+    )
+    if orientation in ORIENTATIONS:
+        image = image.transpose(ORIENTATIONS[orientation])
+    # PNG и WebP пишут EXIF из info обратно: вместе с ним ушли бы
+    # координаты съёмки и модель камеры.
+    image.info.pop('exif', None)
+    options = {'icc_profile': image.info.get('icc_profile'), 'exif': b''}
+    if image_format == 'JPEG':
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        options.update(
+            quality=settings.IMAGE_JPEG_QUALITY,
+            optimize=True,
+            progressive=True,
+        )
+    output = SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+    )
+    image.save(output, image_format, **options)
+    size = output.tell()
+    output.seek(0)
+    name = os.path.splitext(os.path.basename(upload.name))[0]
+    return UploadedFile(
+        output,
+        name=name + EXTENSIONS[image_format],
+        content_type=Image.MIME[image_format],
+        size=size,
+    )
@@ -0,0 +1,165 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core.pagination import CursorPaginator
+from posts.models import Comment, Group, Post, UserStats
+from search.backend import Hit, SearchPaginator, match_terms
+
+# Строка плана с доступом к таблице: «SCAN posts_post», «SEARCH posts_post
+# USING INDEX ...» (в старых SQLite — «SCAN TABLE posts_post»).
+TABLE_ACCESS_RE = re.compile(r'^(?:SCAN|SEARCH) (?:TABLE )?(?!\()\S+')
+TEMP_SORTS = (
+    'USE TEMP B-TREE FOR ORDER BY',
+    'USE TEMP B-TREE FOR RIGHT PART OF ORDER BY',
+)
+
+
+def is_bad_plan(plan):
+    """Запрос сортирует во временном B-дереве строки обычной таблицы:
+    она прочитана целиком или по индексу, который не даёт нужного
+    порядка, и время растёт с числом строк. Порядок задаёт внешняя
+    (первая) таблица плана. Выдача FTS5 (VIRTUAL TABLE) не считается:
+    ранг bm25 индексом не упорядочить."""
+    details = [row[-1] for row in plan]
+    if not any(detail in TEMP_SORTS for detail in details):
+        return False
+    outer = next(
+        (detail for detail in details if TABLE_ACCESS_RE.match(detail)), ''
+    )
+    return bool(outer) and 'VIRTUAL TABLE' not in outer
+
+
+class Command(BaseCommand):
+    help = (
+        'Открывает страницы сайта на данных из базы, собирает их '
+        'SELECT-запросы и проверяет EXPLAIN QUERY PLAN каждого. Падает, '
+        'если какой-то запрос сортирует строки таблицы во временном '
+        'B-дереве вместо того, чтобы взять порядок из индекса. Все '
+        'изменения откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='База, на которой снимать планы.'
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            raise CommandError('Команда разбирает планы только SQLite')
+        self.verbosity = options['verbosity']
+        failures = 0
+        # Тестовый клиент ходит на testserver, а ALLOWED_HOSTS на сервере
+        # бывает и ['*'], и пустым.
+        with override_settings(ALLOWED_HOSTS=['testserver']), \
+                transaction.atomic(using=connection.alias):
+            for name, url, user in self.pages():
+                queries = self.capture(connection, url, user)
+                failures += self.check_page(connection, name, url, queries)
+            transaction.set_rollback(True, using=connection.alias)
+        if failures:
+            raise CommandError(
+                f'Запросов с сортировкой мимо индекса: {failures}'
+            )
+        self.stdout.write('Все запросы идут по индексам')
+
+    def pages(self):
+        """(название, адрес, пользователь) для каждой страницы, которую
+        можно открыть на имеющихся данных. Каждый список открывается
+        и с курсором, потому что keyset-условие меняет план."""
+        post = Post.objects.order_by('-comment_count').first()
+        if post is None:
+            raise CommandError('В базе нет постов, проверять нечего')
+        cursor = CursorPaginator(Post.objects.all(), 1).encode_cursor(post)
+        author = UserStats.objects.order_by('-posts').first().user
+        reader = UserStats.objects.order_by('-following').first().user
+        group = Group.objects.order_by('-post_count').first()
+
+        pages = [
+            ('index', reverse('posts:index'), None),
+            ('profile', reverse('posts:profile', args=(author.username,)),
+             None),
+            ('post_detail', reverse('posts:post_detail', args=(post.pk,)),
+             None),
+            ('follow_index', reverse('posts:follow_index'), reader),
+        ]
+        if group is not None:
+            pages.append(
+                ('group_list', reverse('posts:group_list', args=(group.slug,)),
+                 None)
+            )
+        paged = [
+            (f'{name} (курсор)', f'{url}?cursor={cursor}', user)
+            for name, url, user in pages
+        ]
+        comment = Comment.objects.filter(post=post).first()
+        if comment is not None:
+            comment_cursor = CursorPaginator(
+                Comment.objects.all(), 1
+            ).encode_cursor(comment)
+            paged.append((
+                'post_comments',
+                reverse('posts:post_comments', args=(post.pk,))
+                + f'?cursor={comment_cursor}',
+                None,
+            ))
+        terms = match_terms(post.text)
+        if terms:
+            query = max(terms, key=len)
+            search = reverse('search:search') + f'?q={query}'
+            search_cursor = SearchPaginator(query, 1).encode_cursor(
+                Hit(0.0, post.pk)
+            )
+            pages.append(('search', search, None))
+            paged.append(
+                ('search (курсор)', f'{search}&cursor={search_cursor}', None)
+            )
+        return pages + paged
+
+    def capture(self, connection, url, user):
+        """SELECT-запросы, которые выполнила страница, с параметрами."""
+        queries = []
+
+        def record(execute, sql, params, many, context):
+            if sql.lstrip().upper().startswith('SELECT'):
+                queries.append((sql, params))
+            return execute(sql, params, many, context)
+
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+        with connection.execute_wrapper(record):
+            response = client.get(url)
+        # Страница с ошибкой или редиректом не выполнила свои запросы:
+        # проверять было бы нечего.
+        if response.status_code != 200:
+            raise CommandError(f'{url} ответил {response.status_code}')
+        return queries
+
+    def check_page(self, connection, name, url, queries):
+        failures = 0
+        seen = set()
+        with connection.cursor() as cursor:
+            for sql, params in queries:
+                if sql in seen:
+                    continue
+                seen.add(sql)
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                plan = cursor.fetchall()
+                bad = is_bad_plan(plan)
+                failures += bad
+                if bad or self.verbosity > 1:
+                    self.stdout.write(f'\n{url}\n{sql}')
+                    for row in plan:
+                        self.stdout.write(f'  {row[-1]}')
+        status = (
+            self.style.ERROR(f'{failures} плохих')
+            if failures else self.style.SUCCESS('OK')
+        )
+        self.stdout.write(f'{name}: {len(seen)} запросов, {status}')
+        return failures
@@ -0,0 +1,85 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from core.pagination import FORWARD, CursorPaginator, MergedCursorPaginator
+from posts.models import Follow, User
+from posts.timeline import (PULL_KEY, PUSH_KEY, pull_authors,
+                            timeline_sources)
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает порог гибридной ленты подписок и время чтения '
+        'первой страницы по push- и pull-пути.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', action='append', dest='usernames', default=[],
+            help='Читатель, для которого замерить ленту (можно несколько).'
+        )
+        parser.add_argument(
+            '--top', type=int, default=5,
+            help='Сколько самых активных читателей замерить без --user.'
+        )
+        parser.add_argument('--per-page', type=int, default=10)
+
+    def handle(self, *args, **options):
+        heavy = pull_authors()
+        self.stdout.write(
+            f'Пороги: в pull выше {settings.TIMELINE_PULL_THRESHOLD}, '
+            f'в push ниже {settings.TIMELINE_PUSH_THRESHOLD} подписчиков'
+        )
+        authors = Follow.objects.values('author').distinct().count()
+        self.stdout.write(
+            f'Авторов в pull-режиме: {len(heavy)}, '
+            f'в push-режиме: {authors - len(heavy)}'
+        )
+        for user in self.get_readers(options):
+            pushed, pulled = timeline_sources(user)
+            push_ms, push_rows = self.measure(
+                pushed, PUSH_KEY, options['per_page']
+            )
+            line = f'{user.username}: push {push_ms:.2f} мс ({push_rows})'
+            if pulled:
+                pull_ms, pull_rows = self.measure_merged(
+                    pulled, PULL_KEY, options['per_page']
+                )
+                line += (
+                    f', pull {pull_ms:.2f} мс ({pull_rows}, '
+                    f'авторов: {len(pulled)})'
+                )
+            self.stdout.write(line)
+
+    def get_readers(self, options):
+        if options['usernames']:
+            readers = list(
+                User.objects.filter(username__in=options['usernames'])
+            )
+            if len(readers) != len(set(options['usernames'])):
+                raise CommandError('Не все пользователи найдены')
+            return readers
+        return User.objects.annotate(
+            follows=Count('follower')
+        ).filter(follows__gt=0).order_by('-follows')[:options['top']]
+
+    def measure(self, queryset, key, per_page):
+        return self.measure_paginator(
+            CursorPaginator(queryset, per_page, key=key), per_page
+        )
+
+    def measure_merged(self, querysets, key, per_page):
+        return self.measure_paginator(
+            MergedCursorPaginator(
+                [(queryset, key) for queryset in querysets], per_page
+            ),
+            per_page
+        )
+
+    def measure_paginator(self, paginator, per_page):
+        start = time.perf_counter()
+        rows = paginator.fetch(None, FORWARD, per_page + 1)
+        return (time.perf_counter() - start) * 1000, len(rows)
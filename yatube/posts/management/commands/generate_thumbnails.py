@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import generate_thumbnails, thumbnail_variants
+
+
+class Command(BaseCommand):
+    help = (
+        'Нарезает недостающие варианты миниатюр для уже загруженных '
+        'картинок, например после добавления ширины или формата.'
+    )
+
+    def handle(self, *args, **options):
+        variants = thumbnail_variants()
+        self.stdout.write('Варианты: ' + ', '.join(
+            f'{variant.geometry} {variant.format or "по умолчанию"}'
+            for variant in variants
+        ))
+        done = failed = 0
+        posts = Post.objects.exclude(image='').filter(
+            image_width__isnull=False
+        ).order_by('pk')
+        for name in posts.values_list('image', flat=True).iterator():
+            try:
+                generate_thumbnails(name)
+            except Exception as error:
+                failed += 1
+                self.stderr.write(f'{name}: {error}')
+                continue
+            done += 1
+        self.stdout.write(f'Готово: {done}, с ошибками: {failed}')
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from posts.images import METADATA_FIELDS, read_metadata, set_metadata
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет ширину, высоту, формат и заглушку картинок у постов, '
+        'загруженных до появления этих полей.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Перечитать метаданные у всех постов с картинками.'
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').order_by('pk')
+        if not options['all']:
+            posts = posts.filter(
+                Q(image_width__isnull=True) | Q(image_placeholder='')
+            )
+        batch = []
+        filled = broken = 0
+        for post in posts.only('pk', 'image').iterator():
+            try:
+                with post.image.open('rb') as file:
+                    set_metadata(post, read_metadata(file))
+            except (OSError, SyntaxError) as error:
+                broken += 1
+                self.stderr.write(f'{post.pk}: {post.image.name}: {error}')
+                continue
+            batch.append(post)
+            if len(batch) >= options['batch_size']:
+                filled += self.save(batch)
+        filled += self.save(batch)
+        self.stdout.write(f'Заполнено: {filled}, не прочитано: {broken}')
+
+    def save(self, batch):
+        Post.objects.bulk_update(batch, METADATA_FIELDS)
+        saved = len(batch)
+        batch.clear()
+        return saved
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts.timeline import rebalance_all
+
+
+class Command(BaseCommand):
+    help = (
+        'Переводит авторов ленты подписок между push- и pull-режимами '
+        'по числу подписчиков и раскладывает посты вернувшихся в push. '
+        'Запускается периодически.'
+    )
+
+    def handle(self, *args, **options):
+        pulled, pushed = rebalance_all()
+        self.stdout.write(
+            f'Переведено в pull: {pulled}, возвращено в push: {pushed}'
+        )
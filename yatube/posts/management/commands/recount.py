@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import recount
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счётчики постов, комментариев и подписок '
+        'и исправляет разошедшиеся.'
+    )
+
+    def handle(self, *args, **options):
+        for table, fixed in recount().items():
+            self.stdout.write(f'{table}: исправлено {fixed}')
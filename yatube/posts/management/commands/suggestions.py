@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.suggestions import refresh
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рекомендации «Кого почитать» для читателей, '
+        'у которых менялись подписки, или для всех с --all.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true', dest='everyone',
+            help='Пересчитать всех, а не только помеченных.'
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        users, rows = refresh(everyone=options['everyone'])
+        self.stdout.write(
+            f'Читателей: {users}, рекомендаций: {rows}, '
+            f'{time.perf_counter() - start:.2f} с'
+        )
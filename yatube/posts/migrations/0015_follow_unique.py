@@ -0,0 +1,64 @@
+# Generated by Django 2.2.16 on 2026-10-16 23:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Min
+
+
+def dedupe_follows(apps, schema_editor):
+    """Удаляет подписки без читателя или автора и повторы пары
+    (читатель, автор), оставляя самую раннюю, затем пересчитывает
+    счётчики подписок у затронутых пользователей."""
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+    touched = set()
+    broken = Follow.objects.filter(
+        models.Q(user__isnull=True) | models.Q(author__isnull=True)
+    )
+    for user_id, author_id in broken.values_list('user', 'author'):
+        touched.update((user_id, author_id))
+    broken.delete()
+    duplicates = Follow.objects.values('user', 'author').annotate(
+        keep=Min('pk'), n=Count('pk')
+    ).filter(n__gt=1).order_by()
+    for row in duplicates:
+        Follow.objects.filter(
+            user=row['user'], author=row['author']
+        ).exclude(pk=row['keep']).delete()
+        touched.update((row['user'], row['author']))
+    touched.discard(None)
+    for user_id in touched:
+        UserStats.objects.filter(user_id=user_id).update(
+            followers=Follow.objects.filter(author_id=user_id).count(),
+            following=Follow.objects.filter(user_id=user_id).count(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_comment_post_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_follows, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='follow',
+            name='author',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='following', to=settings.AUTH_USER_MODEL, verbose_name='Автор'),
+        ),
+        migrations.AlterField(
+            model_name='follow',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='follower', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['author', 'user'], name='follow_author_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+    ]
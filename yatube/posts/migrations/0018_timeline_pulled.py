@@ -0,0 +1,22 @@
+# Generated by Django 2.2.16 on 2026-10-17 00:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_follow_suggestions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='timeline_pulled',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Лента в pull-режиме'),
+        ),
+        migrations.AddIndex(
+            model_name='userstats',
+            index=models.Index(condition=models.Q(timeline_pulled=True), fields=['timeline_pulled'], name='userstats_pulled_idx'),
+        ),
+    ]
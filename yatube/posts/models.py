@@ -1,7 +1,10 @@
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models.signals import post_delete, post_save
 
-from core.models import CreatedModel
+from core.models import AtomicSaveModel, CreatedModel
+
+from .storage import HashedStorage
 
 User = get_user_model()
 
@@ -13,32 +16,45 @@ class Group(models.Model):
     - title (name of the group),
     - description (more info about the category),
     - slug (part of the URL that is connected to a certain group),
+    - post_count (maintained number of posts in the group),
     and a method __str__ which prints the Group title.
     """
     title = models.CharField(max_length=200)
     description = models.TextField()
     slug = models.SlugField(unique=True)
+    post_count = models.PositiveIntegerField(
+        'Постов в группе',
+        default=0,
+        editable=False
+    )
 
     def __str__(self):
         return self.title
 
 
-class Post(CreatedModel):
+class Post(CreatedModel, AtomicSaveModel):
     """
     Post model describes a text post and consists of:
     - text (actual post content),
     - group (to which the post is related),
     - pub_date (date of publication, default value is the date of creation,
     of the object),
-    - author (User who created the post).
+    - author (User who created the post),
+    - comment_count (maintained number of comments under the post),
+    - image_width, image_height, image_format (metadata of the original
+    image, read once on upload, see posts.images),
+    - image_placeholder (tiny data: URI shown while the thumbnail loads).
     """
     text = models.TextField(
         'Текст поста',
         help_text='Введите текст поста'
     )
+    # Отдельные индексы внешних ключей покрывают post_author_idx
+    # и post_group_idx.
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
+        db_index=False,
         verbose_name='Автор'
     )
     group = models.ForeignKey(
@@ -47,17 +63,58 @@ class Post(CreatedModel):
         related_name='posts',
         blank=True,
         null=True,
+        db_index=False,
         verbose_name='Группа',
         help_text='Выберите группу'
     )
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=HashedStorage(),
         blank=True
     )
+    comment_count = models.PositiveIntegerField(
+        'Комментариев',
+        default=0,
+        editable=False
+    )
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки',
+        null=True,
+        editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки',
+        null=True,
+        editable=False
+    )
+    image_format = models.CharField(
+        'Формат картинки',
+        max_length=10,
+        blank=True,
+        editable=False
+    )
+    image_placeholder = models.TextField(
+        'Заглушка картинки',
+        blank=True,
+        editable=False
+    )
 
     class Meta:
         ordering = ('-pub_date',)
+        # Списки постов листаются по (pub_date, id) от новых к старым.
+        # SQLite читает индекс с конца, и id (rowid) в нём уже есть,
+        # поэтому возрастающий индекс даёт и порядок, и условие курсора
+        # без сортировки; с '-pub_date' id шли бы в обратную сторону.
+        indexes = [
+            models.Index(fields=('pub_date',), name='post_pub_date_idx'),
+            models.Index(
+                fields=('author', 'pub_date'), name='post_author_idx'
+            ),
+            models.Index(
+                fields=('group', 'pub_date'), name='post_group_idx'
+            ),
+        ]
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
@@ -65,7 +122,7 @@ class Post(CreatedModel):
         return self.text[:15]
 
 
-class Comment(CreatedModel):
+class Comment(CreatedModel, AtomicSaveModel):
     """
     Comment model describes a category of comments under a post
     and consists of:
@@ -77,12 +134,14 @@ class Comment(CreatedModel):
         'Текст комментария',
         help_text='Введите текст комментария'
     )
+    # Индекс внешнего ключа покрывает comment_post_idx.
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
         related_name='comments',
         blank=True,
         null=True,
+        db_index=False,
         verbose_name='Пост',
     )
     author = models.ForeignKey(
@@ -96,6 +155,12 @@ class Comment(CreatedModel):
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = [
+            # Страницы комментариев поста листаются по (pub_date, id).
+            models.Index(
+                fields=('post', 'pub_date'), name='comment_post_idx'
+            ),
+        ]
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
 
@@ -103,26 +168,269 @@ class Comment(CreatedModel):
         return self.text[:15]
 
 
-class Follow(models.Model):
+class FollowManager(models.Manager):
+    """Подписка и отписка одним идемпотентным запросом.
+
+    Повторная подписка не создаёт дубль и не падает на уникальном
+    ограничении, повторная отписка ничего не делает. post_save
+    и post_delete (счётчики, лента) отправляются, только если строка
+    действительно появилась или исчезла.
     """
-    Follow model describes a category of comments under a post
+
+    def follow(self, user_id, author_id):
+        """Возвращает True, если подписка создана этим вызовом."""
+        table = self.model._meta.db_table
+        with transaction.atomic(using=self.db):
+            with connections[self.db].cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO {table} (user_id, author_id) '
+                    'VALUES (%s, %s) '
+                    'ON CONFLICT (user_id, author_id) DO NOTHING',
+                    [user_id, author_id]
+                )
+                if cursor.rowcount != 1:
+                    return False
+                pk = cursor.lastrowid
+            instance = self.model(pk=pk, user_id=user_id, author_id=author_id)
+            instance._state.adding = False
+            instance._state.db = self.db
+            post_save.send(
+                sender=self.model, instance=instance, created=True,
+                update_fields=None, raw=False, using=self.db
+            )
+        return True
+
+    def unfollow(self, user_id, author_id):
+        """Возвращает True, если подписка удалена этим вызовом."""
+        table = self.model._meta.db_table
+        with transaction.atomic(using=self.db):
+            with connections[self.db].cursor() as cursor:
+                cursor.execute(
+                    f'DELETE FROM {table} '
+                    'WHERE user_id = %s AND author_id = %s RETURNING id',
+                    [user_id, author_id]
+                )
+                deleted = cursor.fetchall()
+            for pk, in deleted:
+                instance = self.model(
+                    pk=pk, user_id=user_id, author_id=author_id
+                )
+                post_delete.send(
+                    sender=self.model, instance=instance, using=self.db
+                )
+        return bool(deleted)
+
+
+class Follow(AtomicSaveModel):
+    """
+    Follow model describes a subscription of a user to an author
     and consists of:
     - follower user,
-    - author whichh is followed
+    - author which is followed.
+    A user follows an author at most once.
     """
+    # Отдельные индексы внешних ключей не нужны: их покрывают
+    # unique_follow и follow_author_idx.
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='following',
-        blank=True,
-        null=True,
+        db_index=False,
         verbose_name='Автор',
     )
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='follower',
-        blank=True,
-        null=True,
+        db_index=False,
         verbose_name='Пользователь',
     )
+
+    objects = FollowManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'author'), name='unique_follow'
+            ),
+        ]
+        indexes = [
+            # Уникальный индекс начинается с user, подписчики автора
+            # ищутся по этому.
+            models.Index(fields=('author', 'user'), name='follow_author_idx'),
+        ]
+
+
+class StoredImage(models.Model):
+    """
+    StoredImage counts references to a file in HashedStorage:
+    - name (path of the file, the same for identical uploads),
+    - ref_count (number of posts using the file).
+    The file and its thumbnails are deleted when ref_count
+    drops to zero (see posts.storage).
+    """
+    name = models.CharField('Файл', max_length=255, primary_key=True)
+    ref_count = models.PositiveIntegerField('Ссылок', default=0)
+
+    class Meta:
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
+
+    def __str__(self):
+        return f'{self.name}: {self.ref_count}'
+
+
+class UserStats(models.Model):
+    """
+    UserStats keeps maintained counters of a user:
+    - posts (number of posts written by the user),
+    - followers (number of users following the user),
+    - following (number of authors the user follows),
+    - timeline_pulled (the user's posts are read into follow feeds
+    instead of being pushed, see posts.timeline).
+    Counters are updated together with the rows they count
+    (see posts.counters), the recount command repairs drift.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+    )
+    posts = models.PositiveIntegerField('Постов', default=0)
+    followers = models.PositiveIntegerField(
+        'Подписчиков',
+        default=0,
+        db_index=True
+    )
+    following = models.PositiveIntegerField('Подписок', default=0)
+    timeline_pulled = models.BooleanField(
+        'Лента в pull-режиме',
+        default=False,
+        editable=False
+    )
+
+    class Meta:
+        indexes = [
+            # Таких авторов единицы: частичный индекс почти ничего
+            # не весит.
+            models.Index(
+                fields=('timeline_pulled',), name='userstats_pulled_idx',
+                condition=models.Q(timeline_pulled=True)
+            ),
+        ]
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return f'{self.user_id}: {self.posts}/{self.followers}'
+
+
+class TimelineEntry(models.Model):
+    """
+    TimelineEntry is a row of the materialized follow feed
+    of a user and consists of:
+    - user (the reader whose feed it is),
+    - post (a post of a followed author),
+    - author and pub_date (copied from the post, so that the feed
+    can be read and pruned without joining Post and Follow).
+    Rows are written when a post is created and when the user
+    follows or unfollows an author (see posts.timeline).
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'post'), name='unique_timeline_post'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-pub_date', '-post'), name='timeline_feed_idx'
+            ),
+            models.Index(
+                fields=('user', 'author'), name='timeline_author_idx'
+            ),
+        ]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+
+
+class FollowSuggestion(models.Model):
+    """
+    FollowSuggestion is a row of the precomputed "who to follow" list
+    of a user and consists of:
+    - user (the reader the author is suggested to),
+    - author (the suggested author),
+    - score (friends-of-friends plus co-follow similarity).
+    Rows are computed in batch from the Follow graph
+    (see posts.suggestions), pages only read them.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follow_suggestions',
+        db_index=False,
+        verbose_name='Читатель',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+    score = models.FloatField('Оценка')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'author'), name='unique_follow_suggestion'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', 'score'), name='follow_suggestion_idx'
+            ),
+        ]
+        verbose_name = 'Рекомендация автора'
+        verbose_name_plural = 'Рекомендации авторов'
+
+
+class StaleSuggestions(models.Model):
+    """
+    StaleSuggestions marks a user whose follows changed since
+    the suggestions were computed; the suggestions command
+    recomputes only marked users unless asked for all.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+',
+        verbose_name='Читатель',
+    )
+    marked = models.DateTimeField('Помечен', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Устаревшие рекомендации'
+        verbose_name_plural = 'Устаревшие рекомендации'
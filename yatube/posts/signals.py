@@ -0,0 +1,124 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.cache import (
+    COMMENT_COUNTS, POST_LIST, bump_version, comment_list, follow_list
+)
+
+from . import (
+    counters, images, storage, suggestions, timeline, trending
+)
+from .cards import POST_CARDS, invalidate_card
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+# Служебные поля пользователя, которые не видны в списках постов
+HIDDEN_USER_FIELDS = frozenset(('last_login', 'password'))
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or not HIDDEN_USER_FIELDS.issuperset(
+        update_fields
+    ):
+        bump_version(POST_LIST)
+        bump_version(POST_CARDS)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, **kwargs):
+    bump_version(POST_LIST)
+    bump_version(POST_CARDS)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_state(sender, instance, raw=False, **kwargs):
+    instance._previous_group_id = None
+    instance._previous_image = ''
+    if instance.pk is not None and not raw:
+        instance._previous_group_id, instance._previous_image = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                'group_id', 'image'
+            ).first() or (None, '')
+        )
+
+
+@receiver(pre_save, sender=Post)
+def store_image_metadata(sender, instance, raw=False, **kwargs):
+    if not raw:
+        images.update_metadata(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    bump_version(POST_LIST)
+    # Сбрасываем и для новых постов: SQLite может переиспользовать pk
+    # удалённого поста.
+    invalidate_card(instance.pk)
+    if instance._previous_image != instance.image.name:
+        storage.retain(instance.image.name)
+        storage.release(instance._previous_image, instance.image.storage)
+    if created:
+        counters.bump_user(instance.author_id, posts=1)
+        counters.bump_group(instance.group_id, 1)
+        timeline.push_post(instance)
+        trending.post_created(instance)
+        return
+    if instance._previous_group_id != instance.group_id:
+        counters.bump_group(instance._previous_group_id, -1)
+        counters.bump_group(instance.group_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    bump_version(POST_LIST)
+    invalidate_card(instance.pk)
+    storage.release(instance.image.name, instance.image.storage)
+    counters.bump_user(instance.author_id, posts=-1)
+    counters.bump_group(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    bump_version(comment_list(instance.post_id))
+    if created:
+        counters.bump_post(instance.post_id, 1)
+        trending.comment_created(instance)
+        bump_version(COMMENT_COUNTS)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.bump_post(instance.post_id, -1)
+    bump_version(comment_list(instance.post_id))
+    bump_version(COMMENT_COUNTS)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.user_id and instance.author_id:
+        counters.bump_user(instance.author_id, followers=1)
+        counters.bump_user(instance.user_id, following=1)
+        timeline.follow_added(instance.user_id, instance.author_id)
+        suggestions.follow_added(instance.user_id, instance.author_id)
+        bump_version(follow_list(instance.user_id))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    if instance.user_id and instance.author_id:
+        counters.bump_user(instance.author_id, followers=-1)
+        counters.bump_user(instance.user_id, following=-1)
+        timeline.follow_removed(instance.user_id, instance.author_id)
+        suggestions.mark_stale(instance.user_id)
+        bump_version(follow_list(instance.user_id))
@@ -0,0 +1,89 @@
+"""
+Хранилище картинок постов с адресацией по содержимому.
+
+Файл сохраняется под именем posts/<2 символа хэша>/<sha256>.<расширение>,
+поэтому одинаковые загрузки ложатся в один файл, а sorl-thumbnail,
+который строит имя миниатюры из имени исходника, режет для них одни
+и те же миниатюры. Сколько постов ссылается на файл, хранится
+в StoredImage; когда ссылок не остаётся, файл удаляется вместе
+с миниатюрами.
+"""
+import hashlib
+import logging
+import os
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+from sorl.thumbnail import delete as delete_with_thumbnails
+from sorl.thumbnail.images import ImageFile
+
+logger = logging.getLogger(__name__)
+
+
+@deconstructible
+class HashedStorage(FileSystemStorage):
+    """Файловое хранилище, в котором имя файла — хэш содержимого."""
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, digest[:2], digest + extension)
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
+
+
+def retain(name):
+    """Добавляет ссылку на сохранённый файл."""
+    from .models import StoredImage
+
+    if not name:
+        return
+    if StoredImage.objects.filter(name=name).update(
+        ref_count=F('ref_count') + 1
+    ):
+        return
+    try:
+        with transaction.atomic():
+            StoredImage.objects.create(name=name, ref_count=1)
+    except IntegrityError:
+        # Строку только что создал параллельный запрос.
+        retain(name)
+
+
+def release(name, storage):
+    """Убирает ссылку; файл без ссылок удаляется после коммита."""
+    from .models import StoredImage
+
+    if not name:
+        return
+    StoredImage.objects.filter(name=name, ref_count__gt=0).update(
+        ref_count=F('ref_count') - 1
+    )
+    deleted, _ = StoredImage.objects.filter(name=name, ref_count=0).delete()
+    if deleted:
+        transaction.on_commit(lambda: remove(name, storage))
+
+
+def remove(name, storage):
+    from .models import StoredImage
+
+    # Пока ждали коммита, тот же файл могли загрузить снова.
+    if StoredImage.objects.filter(name=name).exists():
+        return
+    try:
+        delete_with_thumbnails(ImageFile(name, storage))
+    except (OSError, SuspiciousFileOperation):
+        logger.exception('Не удалось удалить картинку %s', name)
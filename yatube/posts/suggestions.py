@@ -0,0 +1,173 @@
+"""
+Рекомендации «Кого почитать» по графу подписок.
+
+Граф подписок читается из Follow в разреженные списки смежности: для
+каждого читателя — множество его авторов, для каждого автора — его
+читатели. Кандидат b для читателя u получает две оценки:
+
+- друзья друзей: на скольких авторов u подписан b (строка u
+  произведения A·A матрицы смежности);
+- совместные подписки: сумма по авторам a читателя u косинусной
+  близости a и b, |F(a) ∩ F(b)| / sqrt(|F(a)|·|F(b)|), где F — множество
+  читателей. Близкие авторы для a считаются по выборке из
+  SUGGESTIONS_SAMPLE последних читателей a и запоминаются.
+
+Лучшие SUGGESTIONS_COUNT кандидатов пишутся в FollowSuggestion, и страница
+читает готовый список одним запросом по индексу, не обходя граф. Подписка
+сразу убирает автора из рекомендаций и помечает рекомендации читателя
+устаревшими, команда suggestions пересчитывает помеченных. Новые
+подписки авторов, на которых подписан читатель, его пометку не ставят
+(таких читателей может быть очень много), их подхватывает полный
+пересчёт suggestions --all.
+"""
+import heapq
+import math
+from collections import Counter, defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core.cache import bump_version, follow_suggestions
+
+from .models import Follow, FollowSuggestion, StaleSuggestions
+
+FOF_WEIGHT = 1.0
+COFOLLOW_WEIGHT = 1.0
+BATCH_SIZE = 500
+
+
+class FollowGraph:
+    """Граф подписок в памяти: списки смежности в обе стороны."""
+
+    def __init__(self, pairs, sample_size):
+        self.following = defaultdict(set)
+        self.readers = defaultdict(list)
+        self.reader_count = Counter()
+        self.similar_cache = {}
+        # pairs идут от новых подписок к старым: в выборку попадают
+        # последние читатели автора.
+        for user_id, author_id in pairs:
+            self.following[user_id].add(author_id)
+            self.reader_count[author_id] += 1
+            if len(self.readers[author_id]) < sample_size:
+                self.readers[author_id].append(user_id)
+
+    @classmethod
+    def load(cls):
+        pairs = Follow.objects.order_by('-pk').values_list(
+            'user_id', 'author_id'
+        )
+        return cls(
+            pairs.iterator(chunk_size=10000), settings.SUGGESTIONS_SAMPLE
+        )
+
+    def similar(self, author_id):
+        """[(автор, близость)] — самые близкие к author_id авторы."""
+        if author_id not in self.similar_cache:
+            sample = self.readers[author_id]
+            common = Counter()
+            for reader_id in sample:
+                common.update(self.following[reader_id])
+            common.pop(author_id, None)
+            # Общих читателей в выборке меньше, чем всего: масштабируем.
+            scale = self.reader_count[author_id] / max(len(sample), 1)
+            size = self.reader_count[author_id]
+            self.similar_cache[author_id] = heapq.nlargest(
+                settings.SUGGESTIONS_SIMILAR,
+                (
+                    (other, scale * count / math.sqrt(
+                        size * self.reader_count[other]
+                    ))
+                    for other, count in common.items()
+                ),
+                key=lambda item: item[1]
+            )
+        return self.similar_cache[author_id]
+
+    def suggest(self, user_id, count):
+        """До count пар (автор, оценка), лучшие первыми."""
+        followed = self.following.get(user_id, set())
+        scores = defaultdict(float)
+        for author_id in followed:
+            for candidate in self.following.get(author_id, ()):
+                scores[candidate] += FOF_WEIGHT
+            for candidate, similarity in self.similar(author_id):
+                scores[candidate] += COFOLLOW_WEIGHT * similarity
+        for excluded in followed | {user_id}:
+            scores.pop(excluded, None)
+        return heapq.nlargest(
+            count, scores.items(), key=lambda item: (item[1], -item[0])
+        )
+
+
+def store(graph, user_ids):
+    """Пересчитывает и сохраняет рекомендации пачки читателей."""
+    rows = [
+        FollowSuggestion(user_id=user_id, author_id=author_id, score=score)
+        for user_id in user_ids
+        for author_id, score in graph.suggest(
+            user_id, settings.SUGGESTIONS_COUNT
+        )
+    ]
+    with transaction.atomic():
+        FollowSuggestion.objects.filter(user_id__in=user_ids).delete()
+        FollowSuggestion.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+        for user_id in user_ids:
+            bump_version(follow_suggestions(user_id))
+    return len(rows)
+
+
+def refresh(everyone=False, graph=None):
+    """Пересчитывает рекомендации устаревших читателей или, с everyone,
+    всех подписанных хоть на кого-то. Возвращает (читателей, строк)."""
+    started = timezone.now()
+    stale = StaleSuggestions.objects.filter(marked__lte=started)
+    if everyone:
+        # Рекомендации тех, кто отписался от всех, тоже надо убрать.
+        user_ids = set(
+            Follow.objects.values_list('user_id', flat=True).distinct()
+        ) | set(
+            FollowSuggestion.objects.values_list('user_id', flat=True)
+            .distinct()
+        )
+    else:
+        user_ids = set(stale.values_list('user_id', flat=True))
+    if not user_ids:
+        return 0, 0
+    graph = graph or FollowGraph.load()
+    users = iter(sorted(user_ids))
+    stored = 0
+    while True:
+        batch = list(islice(users, BATCH_SIZE))
+        if not batch:
+            break
+        stored += store(graph, batch)
+    # Пометки, сделанные во время пересчёта, остаются до следующего.
+    stale.delete()
+    return len(user_ids), stored
+
+
+def follow_added(user_id, author_id):
+    """Новый автор сразу пропадает из рекомендаций читателя."""
+    FollowSuggestion.objects.filter(
+        user_id=user_id, author_id=author_id
+    ).delete()
+    mark_stale(user_id)
+
+
+def mark_stale(user_id):
+    StaleSuggestions.objects.update_or_create(user_id=user_id)
+
+
+def suggestions_for(user):
+    """Готовые рекомендации для страницы: один запрос по индексу
+    (user, score)."""
+    if not user.is_authenticated:
+        return []
+    return list(
+        FollowSuggestion.objects.filter(user=user).select_related(
+            'author'
+        ).order_by('-score')[:settings.SUGGESTIONS_COUNT]
+    )
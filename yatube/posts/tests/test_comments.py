@@ -0,0 +1,114 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Post
+from ..views import COMMENTS_PER_PAGE
+
+User = get_user_model()
+
+
+class CommentPagesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='commented')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def add_comments(self, count):
+        start = User.objects.count()
+        users = [
+            User.objects.create_user(username=f'reader{start + i}')
+            for i in range(count)
+        ]
+        return [
+            Comment.objects.create(author=user, post=self.post, text=str(i))
+            for i, user in enumerate(users)
+        ]
+
+    def detail_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(
+                reverse('posts:post_detail', args=(self.post.pk,))
+            )
+        return len(queries)
+
+    def test_detail_queries_do_not_grow_with_comments(self):
+        """Число запросов страницы поста не зависит от числа комментариев."""
+        self.add_comments(2)
+        few = self.detail_queries()
+        self.add_comments(COMMENTS_PER_PAGE + 5)
+        self.assertEqual(self.detail_queries(), few)
+
+    def test_fragment_returns_next_batch(self):
+        """Фрагмент отдаёт следующую пачку без повторов, до самого конца."""
+        comments = self.add_comments(COMMENTS_PER_PAGE + 3)
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,))
+        )
+        page = response.context['comments']
+        shown = [comment.pk for comment in page]
+        self.assertEqual(len(shown), COMMENTS_PER_PAGE)
+        self.assertContains(response, 'data-comments-more=')
+
+        response = self.client.get(
+            reverse('posts:post_comments', args=(self.post.pk,)),
+            {'cursor': page.next_cursor}
+        )
+        self.assertTemplateUsed(response, 'includes/comments.html')
+        self.assertNotContains(response, '<html')
+        self.assertNotContains(response, 'data-comments-more=')
+        shown += [comment.pk for comment in response.context['comments']]
+        self.assertEqual(
+            shown, [comment.pk for comment in reversed(comments)]
+        )
+
+    def test_fragment_for_missing_post(self):
+        response = self.client.get(
+            reverse('posts:post_comments', args=(self.post.pk + 1,))
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class AjaxCommentTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='ajax_reader')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        Comment.objects.create(author=cls.user, post=cls.post, text='Был')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def send(self, text, **headers):
+        return self.client.post(
+            reverse('posts:add_comment', args=(self.post.pk,)),
+            {'text': text}, **headers
+        )
+
+    def test_xhr_gets_fragment_and_count(self):
+        """На XHR приходит HTML нового комментария и число комментариев."""
+        response = self.send(
+            '<b>Новый</b>', HTTP_X_REQUESTED_WITH='XMLHttpRequest'
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['count'], 2)
+        self.assertIn('&lt;b&gt;Новый&lt;/b&gt;', data['html'])
+        self.assertIn(self.user.username, data['html'])
+        self.assertNotIn('<html', data['html'])
+
+    def test_xhr_invalid_form(self):
+        response = self.send('', HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('text', response.json()['errors'])
+        self.assertEqual(Comment.objects.filter(post=self.post).count(), 1)
+
+    def test_form_post_still_redirects(self):
+        response = self.send('Без JS')
+        self.assertRedirects(
+            response, reverse('posts:post_detail', args=(self.post.pk,))
+        )
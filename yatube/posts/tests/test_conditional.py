@@ -0,0 +1,135 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+from ..suggestions import refresh
+
+User = get_user_model()
+
+
+class ConditionalPagesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='cond_author')
+        cls.reader = User.objects.create_user(username='cond_reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='cond-group', description=''
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = self.client_class()
+        self.reader_client.force_login(self.reader)
+        self.urls = {
+            'index': reverse('posts:index'),
+            'group': reverse('posts:group_list', args=(self.group.slug,)),
+            'profile': reverse('posts:profile', args=('cond_author',)),
+            'post': reverse('posts:post_detail', args=(self.post.pk,)),
+        }
+
+    def etag(self, url, client=None):
+        return (client or self.client).get(url)['ETag']
+
+    def revalidate(self, url, etag, client=None):
+        return (client or self.client).get(
+            url, HTTP_IF_NONE_MATCH=etag
+        ).status_code
+
+    def test_unchanged_pages_answer_304(self):
+        queries = {'index': 0, 'group': 0, 'profile': 1, 'post': 0}
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                etag = self.etag(url)
+                self.assertFalse(etag.startswith('W/'))
+                with self.assertNumQueries(queries[name]):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+
+    def test_versions_expire(self):
+        """Изменение, которого процесс не увидел (его версию поднял
+        другой процесс со своим LocMemCache), перестаёт давать 304 по
+        старому ETag, когда истекают версии."""
+        url = self.urls['index']
+        etag = self.etag(url)
+        Post.objects.filter(pk=self.post.pk).update(text='Чужая правка')
+        self.assertEqual(self.revalidate(url, etag), 304)
+        later = time.time() + settings.CACHE_VERSION_TIMEOUT + 1
+        with mock.patch('time.time', return_value=later):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Чужая правка')
+
+    def test_etag_depends_on_viewer(self):
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                self.assertEqual(
+                    self.revalidate(url, self.etag(url), self.reader_client),
+                    200
+                )
+
+    def test_changes_invalidate(self):
+        def new_post():
+            Post.objects.create(author=self.author, text='Ещё пост')
+
+        def comment():
+            Comment.objects.create(
+                post=self.post, author=self.reader, text='к'
+            )
+
+        def follow():
+            Follow.objects.follow(self.reader.pk, self.author.pk)
+
+        cases = (
+            ('index', new_post),
+            ('index', comment),
+            ('group', comment),
+            ('post', comment),
+            ('profile', follow),
+        )
+        for name, change in cases:
+            with self.subTest(page=name, change=change.__name__):
+                url = self.urls[name]
+                etag = self.etag(url)
+                change()
+                self.assertEqual(self.revalidate(url, etag), 200)
+
+    def test_profile_follows_viewer_suggestions(self):
+        friend = User.objects.create_user(username='cond_friend')
+        Follow.objects.follow(self.reader.pk, friend.pk)
+        Follow.objects.follow(friend.pk, self.author.pk)
+        url = self.urls['profile']
+        etag = self.etag(url, self.reader_client)
+        refresh()
+        self.assertEqual(self.revalidate(url, etag, self.reader_client), 200)
+
+    def test_trending_bucket_change_invalidates(self):
+        url = self.urls['index']
+        etag = self.etag(url)
+        with mock.patch('posts.views.current_bucket', return_value=0):
+            self.assertEqual(self.revalidate(url, etag), 200)
+
+    def test_if_modified_since(self):
+        Comment.objects.create(post=self.post, author=self.reader, text='к')
+        for name in ('index', 'group', 'post'):
+            with self.subTest(page=name):
+                url = self.urls[name]
+                modified = self.client.get(url)['Last-Modified']
+                self.assertEqual(
+                    self.client.get(
+                        url, HTTP_IF_MODIFIED_SINCE=modified
+                    ).status_code,
+                    304
+                )
+        self.assertFalse(
+            self.client.get(self.urls['profile']).has_header('Last-Modified')
+        )
@@ -0,0 +1,134 @@
+import csv
+import json
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from ..export import buffered, export_response
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='ex_user')
+        cls.other = User.objects.create_user(username='ex_other')
+        cls.group = Group.objects.create(
+            title='Группа', slug='ex-group', description=''
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Первый, "с запятой"'
+        )
+        # Файла нет на диске: выгрузка не должна его открывать.
+        Post.objects.filter(pk=cls.post.pk).update(
+            image='posts/ab/missing.gif'
+        )
+        cls.second = Post.objects.create(author=cls.user, text='Второй')
+        cls.comment = Comment.objects.create(
+            post=cls.post, author=cls.user, text='Свой комментарий'
+        )
+        Comment.objects.create(
+            post=cls.post, author=cls.other, text='Чужой комментарий'
+        )
+        Post.objects.create(author=cls.other, text='Чужой пост')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def content(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson(self):
+        response = self.client.get(reverse('posts:export_data'))
+        self.assertEqual(
+            response['Content-Type'], 'application/x-ndjson; charset=utf-8'
+        )
+        self.assertIn('yatube-ex_user.ndjson', response['Content-Disposition'])
+        records = [
+            json.loads(line)
+            for line in self.content(response).splitlines()
+        ]
+        self.assertEqual(
+            [(r['type'], r['id']) for r in records],
+            [('post', self.post.pk), ('post', self.second.pk),
+             ('comment', self.comment.pk)]
+        )
+        self.assertEqual(records[0], {
+            'type': 'post',
+            'id': self.post.pk,
+            'author': 'ex_user',
+            'pub_date': self.post.pub_date.isoformat(),
+            'group': 'ex-group',
+            'text': 'Первый, "с запятой"',
+            'image': 'http://testserver/media/posts/ab/missing.gif',
+            'comment_count': 2,
+        })
+        self.assertIsNone(records[1]['image'])
+        self.assertEqual(records[2]['post'], self.post.pk)
+
+    def test_csv(self):
+        response = self.client.get(
+            reverse('posts:export_data'), {'format': 'csv'}
+        )
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.DictReader(StringIO(self.content(response))))
+        self.assertEqual(
+            [row['text'] for row in rows],
+            ['Первый, "с запятой"', 'Второй', 'Свой комментарий']
+        )
+        self.assertEqual(rows[2]['post'], str(self.post.pk))
+
+    def test_errors(self):
+        self.assertEqual(
+            self.client.get(
+                reverse('posts:export_data'), {'format': 'xml'}
+            ).status_code,
+            404
+        )
+        self.client.logout()
+        self.assertEqual(
+            self.client.get(reverse('posts:export_data')).status_code, 302
+        )
+
+    def test_rows_are_read_lazily(self):
+        with self.assertNumQueries(0):
+            response = export_response(
+                [(self.user.pk, 'ex_user')], 'ndjson', 'export'
+            )
+        with self.settings(EXPORT_CHUNK_SIZE=1):
+            with self.assertNumQueries(2):
+                content = self.content(response)
+        self.assertEqual(len(content.splitlines()), 3)
+
+    def test_buffered(self):
+        self.assertEqual(
+            list(buffered(['ab', 'c', 'de', 'f'], size=3)),
+            ['abc', 'def']
+        )
+        self.assertEqual(list(buffered(['ab', 'c', 'd'], size=3)),
+                         ['abc', 'd'])
+
+    def test_admin_action(self):
+        admin = User.objects.create_superuser(
+            'ex_admin', 'admin@example.com', 'password'
+        )
+        self.client.force_login(admin)
+        response = self.client.post(
+            reverse('admin:auth_user_changelist'),
+            {
+                'action': 'export_csv',
+                '_selected_action': [self.user.pk, self.other.pk],
+            }
+        )
+        rows = list(csv.DictReader(StringIO(self.content(response))))
+        self.assertEqual(
+            [(row['type'], row['author']) for row in rows],
+            [('post', 'ex_user'), ('post', 'ex_user'),
+             ('comment', 'ex_user'), ('post', 'ex_other'),
+             ('comment', 'ex_other')]
+        )
@@ -0,0 +1,60 @@
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Follow, Post, TimelineEntry, UserStats
+
+User = get_user_model()
+
+
+class FollowRelationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='follow_reader')
+        cls.author = User.objects.create_user(username='follow_author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        self.client.force_login(self.reader)
+
+    def follow_url(self, name):
+        return reverse(f'posts:{name}', args=(self.author.username,))
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_follow_is_idempotent(self):
+        """Повторная подписка не создаёт дубль и не двигает счётчики."""
+        self.assertTrue(Follow.objects.follow(self.reader.pk, self.author.pk))
+        with self.assertNumQueries(3):
+            # SAVEPOINT, INSERT ... ON CONFLICT DO NOTHING, RELEASE
+            self.assertFalse(
+                Follow.objects.follow(self.reader.pk, self.author.pk)
+            )
+        self.client.get(self.follow_url('profile_follow'))
+        self.assertEqual(
+            Follow.objects.filter(user=self.reader).count(), 1
+        )
+        self.assertEqual(self.stats(self.author).followers, 1)
+        self.assertEqual(self.stats(self.reader).following, 1)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=self.post
+        ).exists())
+
+    def test_unfollow_is_idempotent(self):
+        Follow.objects.follow(self.reader.pk, self.author.pk)
+        self.client.get(self.follow_url('profile_unfollow'))
+        self.client.get(self.follow_url('profile_unfollow'))
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(self.stats(self.author).followers, 0)
+        self.assertEqual(self.stats(self.reader).following, 0)
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.reader).exists()
+        )
+
+    def test_duplicate_rows_are_rejected(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=self.reader, author=self.author)
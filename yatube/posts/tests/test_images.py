@@ -0,0 +1,253 @@
+import base64
+import os
+import shutil
+import struct
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image, TiffImagePlugin
+
+from ..forms import PostForm
+from ..images import make_placeholder, normalize_upload
+from ..models import Post, StoredImage, User
+from .test_thumbnails import SMALL_GIF, run_now
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_jpeg(size, orientation=None):
+    image = Image.new('RGB', size, (200, 30, 30))
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', exif=exif.tobytes(), quality=100)
+    return SimpleUploadedFile('photo.jpeg', buffer.getvalue(), 'image/jpeg')
+
+
+def mp_segment(entries):
+    """Сегмент APP2 с MP-индексом: записи (атрибут, размер, смещение)."""
+    ifd = TiffImagePlugin.ImageFileDirectory_v2()
+    ifd[0xB000] = b'0100'
+    ifd.tagtype[0xB000] = 7
+    ifd[0xB001] = len(entries)
+    ifd.tagtype[0xB001] = 4
+    ifd[0xB002] = b''.join(
+        struct.pack('<IIIHH', *entry, 0, 0) for entry in entries
+    )
+    ifd.tagtype[0xB002] = 7
+    payload = b'MPF\x00II*\x00' + struct.pack('<I', 8) + ifd.tobytes(8)
+    return b'\xff\xe2' + struct.pack('>H', len(payload) + 2) + payload
+
+
+def make_mpo(size, exif):
+    """Фото в MPO, как его пишут камеры телефонов: JPEG с EXIF и второй
+    кадр следом, а в APP2 — индекс кадров."""
+    frames = []
+    for color in ((200, 30, 30), (30, 30, 200)):
+        buffer = BytesIO()
+        Image.new('RGB', size, color).save(buffer, 'JPEG', exif=exif)
+        frames.append(buffer.getvalue())
+    first, second = frames
+    # Смещения кадров считаются от заголовка TIFF внутри APP2: он идёт
+    # после SOI, маркера, длины и «MPF\0» — 10 байт от начала файла.
+    # Длина сегмента от значений не зависит.
+    offset = len(mp_segment([(0, 0, 0)] * 2)) + len(first) - 10
+    segment = mp_segment([
+        (0x20030000, len(first), 0),
+        (0x00020002, len(second), offset),
+    ])
+    return SimpleUploadedFile(
+        'phone.jpg', first[:2] + segment + first[2:] + second, 'image/jpeg'
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageMetadataTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_metadata_filled_on_upload(self):
+        """Размер и формат пишутся при загрузке и стираются с картинкой."""
+        post = Post.objects.create(
+            author=self.user,
+            image=SimpleUploadedFile('meta.gif', SMALL_GIF, 'image/gif'),
+        )
+        post.refresh_from_db()
+        self.assertEqual(
+            (post.image_width, post.image_height, post.image_format),
+            (2, 1, 'GIF')
+        )
+        self.assertTrue(
+            post.image_placeholder.startswith('data:image/png;base64,')
+        )
+        post.image = None
+        post.save()
+        post.refresh_from_db()
+        self.assertIsNone(post.image_width)
+        self.assertEqual(post.image_format, '')
+        self.assertEqual(post.image_placeholder, '')
+
+    def test_backfill_command(self):
+        """image_metadata заполняет старые посты и пропускает битые файлы."""
+        old = Post.objects.create(author=self.user)
+        old.image.save('old.gif', ContentFile(SMALL_GIF), save=False)
+        broken = Post.objects.create(author=self.user)
+        broken.image.save('broken.gif', ContentFile(b'oops'), save=False)
+        Post.objects.filter(pk=old.pk).update(image=old.image.name)
+        Post.objects.filter(pk=broken.pk).update(image=broken.image.name)
+        out, err = StringIO(), StringIO()
+        call_command('image_metadata', stdout=out, stderr=err)
+        old.refresh_from_db()
+        self.assertEqual((old.image_width, old.image_height), (2, 1))
+        self.assertIn('Заполнено: 1, не прочитано: 1', out.getvalue())
+        self.assertIn(broken.image.name, err.getvalue())
+
+
+@override_settings(IMAGE_MAX_SIDE=200)
+class NormalizeUploadTest(TestCase):
+    def test_large_photo_is_rotated_shrunk_and_stripped(self):
+        """Фото поворачивается по EXIF, ужимается и теряет EXIF."""
+        upload = make_jpeg((900, 300), orientation=6)
+        normalized = normalize_upload(upload)
+        self.assertEqual(normalized.name, 'photo.jpg')
+        self.assertLess(normalized.size, upload.size)
+        with Image.open(normalized) as image:
+            self.assertEqual(image.size, (67, 200))
+            self.assertNotIn('exif', image.info)
+
+    def test_png_exif_is_stripped(self):
+        """EXIF с GPS пропадает и из PNG, большого и маленького."""
+        exif = Image.Exif()
+        exif[0x010F] = 'SecretCam'
+        exif[0x8825] = {1: 'N'}
+        for size in ((3000, 1000), (20, 10)):
+            with self.subTest(size=size):
+                buffer = BytesIO()
+                Image.new('RGBA', size).save(
+                    buffer, 'PNG', exif=exif.tobytes()
+                )
+                normalized = normalize_upload(SimpleUploadedFile(
+                    'shot.png', buffer.getvalue(), 'image/png'
+                ))
+                with Image.open(normalized) as image:
+                    self.assertEqual(image.format, 'PNG')
+                    self.assertNotIn('exif', image.info)
+                    self.assertEqual(dict(image.getexif()), {})
+
+    def test_large_tiff_is_converted(self):
+        """TIFF больше IMAGE_MAX_SIDE ужимается и пересохраняется в JPEG,
+        а не роняет форму."""
+        buffer = BytesIO()
+        Image.new('RGB', (900, 300), (200, 30, 30)).save(
+            buffer, 'TIFF', tiffinfo={0x0112: 6}
+        )
+        upload = SimpleUploadedFile(
+            'scan.tiff', buffer.getvalue(), 'image/tiff'
+        )
+        form = PostForm(data={'text': 'Скан'}, files={'image': upload})
+        self.assertTrue(form.is_valid(), form.errors)
+        with Image.open(form.cleaned_data['image']) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size, (67, 200))
+
+    def test_mpo_photo_is_reencoded(self):
+        """Фото в MPO — не анимация: от него остаётся первый кадр
+        в JPEG, ужатый и без EXIF."""
+        exif = Image.Exif()
+        exif[0x010F] = 'SecretCam'
+        exif[0x8825] = {1: 'N'}
+        upload = make_mpo((900, 300), exif.tobytes())
+        with Image.open(upload) as image:
+            self.assertEqual((image.format, image.n_frames), ('MPO', 2))
+        normalized = normalize_upload(upload)
+        self.assertIsNot(normalized, upload)
+        with Image.open(normalized) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size, (200, 67))
+            self.assertNotIn('exif', image.info)
+            self.assertGreater(image.getpixel((0, 0))[0], 150)
+
+    def test_placeholder_is_tiny(self):
+        """Заглушка в пропорциях карточки и весит сотни байт."""
+        with Image.open(make_jpeg((4000, 3000))) as image:
+            placeholder = make_placeholder(image)
+        self.assertLess(len(placeholder), 1000)
+        data = base64.b64decode(placeholder.split(',', 1)[1])
+        with Image.open(BytesIO(data)) as image:
+            self.assertEqual(image.size, (16, 6))
+
+    def test_small_clean_image_is_kept(self):
+        upload = SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif')
+        self.assertIs(normalize_upload(upload), upload)
+
+    @override_settings(IMAGE_MAX_PIXELS=1000)
+    def test_too_many_pixels_rejected(self):
+        """Картинка с огромным числом пикселей не проходит форму."""
+        form = PostForm(
+            data={'text': 'Бомба'},
+            files={'image': make_jpeg((100, 100))},
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@mock.patch('posts.storage.transaction.on_commit', run_now)
+class HashedStorageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create(self, name, content=SMALL_GIF):
+        return Post.objects.create(
+            author=self.user,
+            image=SimpleUploadedFile(name, content, 'image/gif'),
+        )
+
+    def refs(self, name):
+        return StoredImage.objects.get(name=name).ref_count
+
+    def test_identical_uploads_share_file(self):
+        """Одинаковые картинки хранятся одним файлом со счётчиком ссылок."""
+        first = self.create('meme.gif')
+        second = self.create('meme-copy.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(self.refs(first.image.name), 2)
+        folder = os.path.dirname(first.image.path)
+        self.assertEqual(len(os.listdir(folder)), 1)
+
+    def test_file_removed_with_last_reference(self):
+        """Файл удаляется, когда на него не ссылается ни один пост."""
+        first = self.create('one.gif')
+        second = self.create('two.gif')
+        name, path = first.image.name, first.image.path
+        first.delete()
+        self.assertEqual(self.refs(name), 1)
+        self.assertTrue(os.path.exists(path))
+        second.image = SimpleUploadedFile(
+            'other.gif', SMALL_GIF.replace(b'\xFF', b'\xFE'), 'image/gif'
+        )
+        second.save()
+        self.assertFalse(StoredImage.objects.filter(name=name).exists())
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(self.refs(second.image.name), 1)
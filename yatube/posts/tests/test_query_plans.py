@@ -0,0 +1,87 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from posts.management.commands.check_query_plans import (Command,
+                                                         is_bad_plan)
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+def plan(*details):
+    return [(i, 0, 0, detail) for i, detail in enumerate(details)]
+
+
+class QueryPlansTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='plan_reader')
+        cls.author = User.objects.create_user(username='plan_author')
+        group = Group.objects.create(title='Группа', slug='plans')
+        posts = [
+            Post.objects.create(
+                author=cls.author, group=group, text=f'Пост номер {i}'
+            )
+            for i in range(3)
+        ]
+        Comment.objects.create(author=cls.reader, post=posts[0], text='Да')
+        Follow.objects.follow(cls.reader.pk, cls.author.pk)
+
+    def setUp(self):
+        cache.clear()
+
+    def check_plans(self):
+        out = StringIO()
+        call_command('check_query_plans', stdout=out)
+        return out.getvalue()
+
+    def test_views_use_indexes(self):
+        output = self.check_plans()
+        self.assertIn('follow_index (курсор)', output)
+        self.assertIn('Все запросы идут по индексам', output)
+
+    @override_settings(TIMELINE_PULL_THRESHOLD=0)
+    def test_pulled_feed_uses_indexes(self):
+        """Посты «тяжёлых» авторов в ленте тоже читаются по индексу."""
+        self.assertIn('Все запросы идут по индексам', self.check_plans())
+
+    def test_any_allowed_hosts(self):
+        """Команда открывает страницы при любом ALLOWED_HOSTS."""
+        for hosts in (['*'], [], ['example.com']):
+            with self.subTest(hosts=hosts), \
+                    override_settings(ALLOWED_HOSTS=hosts):
+                self.assertIn('Все запросы идут по индексам',
+                              self.check_plans())
+
+    def test_failed_page_is_an_error(self):
+        """Страница, ответившая не 200, роняет команду, а не проходит
+        проверку без запросов."""
+        pages = [('missing', '/missing/', None)]
+        with mock.patch.object(Command, 'pages', return_value=pages):
+            with self.assertRaisesMessage(
+                CommandError, '/missing/ ответил 404'
+            ):
+                self.check_plans()
+
+    def test_bad_plan_detection(self):
+        self.assertTrue(is_bad_plan(plan(
+            'SCAN posts_post', 'USE TEMP B-TREE FOR ORDER BY'
+        )))
+        self.assertTrue(is_bad_plan(plan(
+            'SEARCH posts_post USING INDEX posts_post_author_id (author_id=?)',
+            'USE TEMP B-TREE FOR RIGHT PART OF ORDER BY',
+        )))
+        self.assertFalse(is_bad_plan(plan(
+            'SCAN posts_post USING INDEX post_pub_date_idx',
+            'SEARCH auth_user USING INTEGER PRIMARY KEY (rowid=?)',
+        )))
+        self.assertFalse(is_bad_plan(plan(
+            'SCAN search_post VIRTUAL TABLE INDEX 0:M1',
+            'USE TEMP B-TREE FOR ORDER BY',
+        )))
@@ -0,0 +1,79 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Follow, FollowSuggestion, StaleSuggestions
+from ..suggestions import FollowGraph, refresh, suggestions_for
+
+User = get_user_model()
+
+
+class FollowGraphTest(TestCase):
+    def test_friends_of_friends_and_cofollow(self):
+        """Автор друга и автор, которого читают вместе с нашими."""
+        reader, friend, friends_author, popular, similar = range(1, 6)
+        pairs = [
+            (reader, friend),
+            (reader, popular),
+            (friend, friends_author),
+            # Читатели popular почти всегда читают и similar
+            (10, popular), (10, similar),
+            (11, popular), (11, similar),
+            (12, popular),
+        ]
+        graph = FollowGraph(pairs, sample_size=100)
+        suggested = dict(graph.suggest(reader, 5))
+        self.assertEqual(set(suggested), {friends_author, similar})
+        self.assertNotIn(reader, suggested)
+        self.assertAlmostEqual(suggested[similar], 2 / (4 * 2) ** 0.5)
+
+
+class SuggestionsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader, cls.friend, cls.author = [
+            User.objects.create_user(username=name)
+            for name in ('sg_reader', 'sg_friend', 'sg_author')
+        ]
+        Follow.objects.follow(cls.reader.pk, cls.friend.pk)
+        Follow.objects.follow(cls.friend.pk, cls.author.pk)
+
+    def test_refresh_only_stale_readers(self):
+        self.assertEqual(refresh(), (2, 1))
+        self.assertFalse(StaleSuggestions.objects.exists())
+        self.assertEqual(
+            [s.author for s in suggestions_for(self.reader)], [self.author]
+        )
+        self.assertEqual(refresh(), (0, 0))
+
+    def test_follow_drops_suggestion_at_once(self):
+        refresh()
+        Follow.objects.follow(self.reader.pk, self.author.pk)
+        self.assertEqual(suggestions_for(self.reader), [])
+        self.assertTrue(
+            StaleSuggestions.objects.filter(user=self.reader).exists()
+        )
+
+    def test_refresh_all_clears_unfollowed(self):
+        refresh()
+        Follow.objects.unfollow(self.reader.pk, self.friend.pk)
+        StaleSuggestions.objects.all().delete()
+        refresh(everyone=True)
+        self.assertFalse(
+            FollowSuggestion.objects.filter(user=self.reader).exists()
+        )
+
+    def test_pages_show_suggestions(self):
+        refresh()
+        self.client.force_login(self.reader)
+        for url in (
+            reverse('posts:follow_index'),
+            reverse('posts:profile', args=(self.friend.username,)),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, 'Кого почитать')
+                self.assertContains(
+                    response,
+                    reverse('posts:profile', args=(self.author.username,))
+                )
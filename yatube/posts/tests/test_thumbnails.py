@@ -0,0 +1,187 @@
+import shutil
+import tempfile
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from .. import thumbnails
+from ..models import Post, User
+from ..thumbnails import (LRUCache, dispatch, resolve_thumbnails, resolved,
+                          schedule_thumbnails, thumbnail_variants)
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def run_now(func):
+    func()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPipelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        # Одинаковые картинки ложатся в один файл, а KVStore sorl держит
+        # записи в кэше между тестами.
+        cache.clear()
+        resolved.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def assertThumbnailsReady(self, post):
+        backend = default.backend
+        source = ImageFile(post.image)
+        for variant in thumbnail_variants():
+            options = dict(backend.default_options, **variant.options)
+            name = backend._get_thumbnail_filename(
+                source, variant.geometry, options
+            )
+            thumbnail = ImageFile(name, default.storage)
+            self.assertIsNotNone(default.kvstore.get(thumbnail))
+            self.assertTrue(thumbnail.exists())
+
+    @mock.patch('posts.thumbnails.transaction.on_commit', run_now)
+    def test_create_generates_thumbnails(self):
+        """Миниатюры готовы сразу после создания поста с картинкой."""
+        image = SimpleUploadedFile('eager.gif', SMALL_GIF, 'image/gif')
+        self.client.post(
+            reverse('posts:post_create'),
+            data={'text': 'С картинкой', 'image': image},
+        )
+        post = Post.objects.get(text='С картинкой')
+        self.assertThumbnailsReady(post)
+
+    @mock.patch('posts.thumbnails.dispatch')
+    @mock.patch('posts.thumbnails.transaction.on_commit', run_now)
+    def test_edit_without_image_change_skips(self, dispatch):
+        """Правка текста не перезапускает нарезку."""
+        post = Post.objects.create(author=self.user, text='Без картинки')
+        self.client.post(
+            reverse('posts:post_edit', args=(post.pk,)),
+            data={'text': 'Новый текст'},
+        )
+        dispatch.assert_not_called()
+
+    @mock.patch('posts.thumbnails.transaction.on_commit', run_now)
+    def test_resolver_batches_lookup(self):
+        """Миниатюры страницы ищутся одним запросом, потом берутся из LRU."""
+        posts = []
+        for i in range(3):
+            image = SimpleUploadedFile(f'b{i}.gif', SMALL_GIF, 'image/gif')
+            post = Post.objects.create(author=self.user, image=image)
+            schedule_thumbnails(post)
+            posts.append(post)
+        posts.append(Post.objects.create(author=self.user, text='Без'))
+        resolved.clear()
+        with self.assertNumQueries(1):
+            thumbnails = resolve_thumbnails(posts)
+        self.assertEqual(set(thumbnails), {post.pk for post in posts[:3]})
+        self.assertEqual(thumbnails[posts[0].pk].width, 960)
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_thumbnails(posts), thumbnails)
+
+    @override_settings(POST_THUMBNAIL_FORMATS=('PNG', 'NOPE'))
+    @mock.patch('posts.thumbnails.transaction.on_commit', run_now)
+    def test_picture_lists_variants(self):
+        """В srcset попадают все ширины, форматы без кодека пропускаются."""
+        image = SimpleUploadedFile('pic.gif', SMALL_GIF, 'image/gif')
+        post = Post.objects.create(author=self.user, image=image)
+        schedule_thumbnails(post)
+        picture = resolve_thumbnails([post])[post.pk]
+        self.assertEqual((picture.width, picture.height), (960, 339))
+        self.assertEqual(
+            [width.split()[-1] for width in picture.srcset.split(', ')],
+            ['480w', '960w', '1440w']
+        )
+        self.assertEqual([mime for mime, srcset in picture.sources],
+                         ['image/png'])
+        self.assertIn('.png 480w', picture.sources[0][1])
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, '<source type="image/png"')
+        self.assertContains(response, 'loading="lazy"')
+        self.assertContains(response, 'background: url(data:image/png')
+
+    @mock.patch('posts.thumbnails._make_thumbnail')
+    def test_pending_post_shows_original_until_cut(self, make_thumbnail):
+        """Пока рабочий процесс режет миниатюры, карточка показывает
+        оригинал и не кэшируется; после нарезки видны все варианты."""
+        image = SimpleUploadedFile('late.gif', SMALL_GIF, 'image/gif')
+        post = Post.objects.create(author=self.user, image=image)
+        cache.set(thumbnails.pending_key(post.image.name), True)
+        picture = resolve_thumbnails([post])[post.pk]
+        self.assertFalse(picture.complete)
+        self.assertEqual(picture.url, post.image.url)
+        make_thumbnail.assert_not_called()
+        self.assertNotContains(
+            self.client.get(reverse('posts:index')), '1440w'
+        )
+        future = Future()
+        future.add_done_callback(
+            thumbnails._finished(mock.Mock(), post.image.name)
+        )
+        thumbnails.generate_thumbnails(post.image.name)
+        future.set_result(None)
+        self.assertTrue(resolve_thumbnails([post])[post.pk].complete)
+        self.assertContains(self.client.get(reverse('posts:index')), '1440w')
+
+    def test_lru_evicts_oldest(self):
+        lru = LRUCache(2)
+        lru.set_many({'a': 1, 'b': 2})
+        lru.get_many(['a'])
+        lru.set_many({'c': 3})
+        self.assertEqual(lru.get_many(['a', 'b', 'c']), {'a': 1, 'c': 3})
+
+
+@mock.patch('posts.thumbnails.connection.is_in_memory_db', lambda: False)
+@mock.patch('posts.thumbnails.generate_thumbnails')
+class BrokenPoolTest(TestCase):
+    def setUp(self):
+        self.broken = mock.Mock()
+        self.broken.submit.side_effect = BrokenProcessPool
+        thumbnails._executor = self.broken
+
+    def tearDown(self):
+        thumbnails._executor = None
+
+    def test_broken_pool_is_replaced(self, generate):
+        """Убитый рабочий процесс не роняет загрузку: режем на месте,
+        а следующая нарезка получит новый пул."""
+        dispatch('posts/a.gif')
+        generate.assert_called_once_with('posts/a.gif')
+        self.broken.shutdown.assert_called_once_with(wait=False)
+        self.assertIsNone(thumbnails._executor)
+
+    def test_pool_broken_during_job_is_replaced(self, generate):
+        working = mock.Mock()
+        working.submit.return_value = future = Future()
+        thumbnails._executor = working
+        dispatch('posts/b.gif')
+        with self.assertLogs('posts.thumbnails', 'ERROR'):
+            future.set_exception(BrokenProcessPool())
+        self.assertIsNone(thumbnails._executor)
+        generate.assert_not_called()
@@ -0,0 +1,117 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Group, Post
+from ..trending import (
+    COMMENT_WEIGHT, POST_WEIGHT, SlidingWindowCounter, trending_groups,
+    trending_posts
+)
+
+User = get_user_model()
+
+HOUR = 60 * 60
+NOW = 1000 * HOUR
+
+
+@override_settings(
+    TRENDING_WINDOW=4 * HOUR, TRENDING_BUCKET=HOUR, TRENDING_CAPACITY=3
+)
+class SlidingWindowCounterTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.counter = SlidingWindowCounter('test')
+
+    def test_top_sums_buckets(self):
+        self.counter.hit(1, now=NOW)
+        self.counter.hit(2, 2, now=NOW - HOUR)
+        self.counter.hit(1, 2, now=NOW - 2 * HOUR)
+        self.assertEqual(self.counter.top(5, now=NOW), [(1, 3), (2, 2)])
+        self.assertEqual(self.counter.top(1, now=NOW), [(1, 3)])
+
+    def test_window_slides(self):
+        self.counter.hit(1, 4, now=NOW)
+        # Через 4,5 часа корзина NOW наполовину вышла из окна.
+        self.assertEqual(
+            self.counter.top(5, now=NOW + 4.5 * HOUR), [(1, 2)]
+        )
+        self.assertEqual(self.counter.top(5, now=NOW + 5 * HOUR), [])
+
+    def test_capacity_evicts_least_active(self):
+        for item_id, amount in ((1, 5), (2, 1), (3, 3), (4, 2)):
+            self.counter.hit(item_id, amount, now=NOW)
+        self.assertEqual(
+            self.counter.top(5, now=NOW), [(1, 5), (3, 3), (4, 2)]
+        )
+        # Вытесненный объект возвращается с накопленным счётом.
+        self.counter.hit(2, 9, now=NOW)
+        self.assertEqual(self.counter.top(1, now=NOW), [(2, 10)])
+
+
+class TrendingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='tr_user')
+        cls.group, cls.other = [
+            Group.objects.create(title=slug, slug=slug, description='')
+            for slug in ('tr_group', 'tr_other')
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def comment(self, post, times=1):
+        for _ in range(times):
+            Comment.objects.create(post=post, author=self.user, text='к')
+
+    def test_posts_and_comments_counted(self):
+        quiet = Post.objects.create(
+            author=self.user, group=self.group, text='тихий'
+        )
+        hot = Post.objects.create(
+            author=self.user, group=self.other, text='горячий'
+        )
+        self.comment(hot, 4)
+        self.comment(quiet)
+        self.assertEqual(trending_groups(), [self.other, self.group])
+        self.assertEqual(trending_posts(), [hot, quiet])
+        self.assertEqual(trending_posts(self.group), [quiet])
+        self.assertEqual(
+            dict(SlidingWindowCounter('groups').top(5)),
+            {
+                self.group.pk: POST_WEIGHT + COMMENT_WEIGHT,
+                self.other.pk: POST_WEIGHT + 4 * COMMENT_WEIGHT,
+            }
+        )
+
+    def test_deleted_objects_skipped(self):
+        post = Post.objects.create(author=self.user, text='без группы')
+        self.comment(post)
+        post.delete()
+        self.assertEqual(trending_posts(), [])
+        self.assertEqual(trending_groups(), [])
+
+    def test_pages_show_trending(self):
+        post = Post.objects.create(
+            author=self.user, group=self.group, text='обсуждаемый пост'
+        )
+        self.comment(post)
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.context['trending_posts'], [post])
+                self.assertContains(response, 'Популярное')
+        self.assertEqual(
+            self.client.get(reverse('posts:index')).context[
+                'trending_groups'
+            ],
+            [self.group]
+        )
+
+    def test_reads_do_not_query_posts_or_comments(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(trending_posts(), [])
@@ -1,14 +1,23 @@
 import shutil
 import tempfile
+from io import StringIO
+from unittest import mock
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
-from ..models import Comment, Follow, Group, Post
+from core.pagination import CursorPaginator
+from posts.cards import render_cards
+from posts.timeline import pull_authors
+
+from ..models import Comment, Follow, Group, Post, TimelineEntry
+from .test_thumbnails import run_now
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -373,6 +382,258 @@ class PaginatorViewsTest(TestCase):
                 )
 
 
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='cursor_author')
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'Пост {i}') for i in range(25)
+        )
+        cls.expected = list(
+            Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True
+            )
+        )
+
+    def test_cursor_walks_all_posts_in_order(self):
+        """По курсорам next проходим все посты без пропусков и дублей."""
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        page = paginator.cursor_page()
+        seen = [post.pk for post in page]
+        while page.next_cursor:
+            page = paginator.cursor_page(page.next_cursor)
+            seen.extend(post.pk for post in page)
+        self.assertEqual(seen, self.expected)
+
+    def test_previous_cursor_returns_previous_page(self):
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        first = paginator.cursor_page()
+        second = paginator.cursor_page(first.next_cursor)
+        back = paginator.cursor_page(second.previous_cursor)
+        self.assertEqual(list(back), list(first))
+        self.assertIsNone(back.previous_cursor)
+
+    def test_page_navigation_without_count(self):
+        """Соседние страницы видны по курсорам, а count и номера
+        страниц вместо COUNT(*) и OFFSET выбрасывают ошибку."""
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        first = paginator.cursor_page()
+        last = paginator.cursor_page(
+            paginator.cursor_page(first.next_cursor).next_cursor
+        )
+        self.assertEqual(
+            (first.has_previous(), first.has_next(), len(last)),
+            (False, True, 5)
+        )
+        self.assertEqual((last.has_previous(), last.has_next()),
+                         (True, False))
+        self.assertTrue(last.has_other_pages())
+        with self.assertNumQueries(0):
+            for name in ('count', 'num_pages'):
+                with self.assertRaises(NotImplementedError):
+                    getattr(paginator, name)
+            with self.assertRaises(NotImplementedError):
+                paginator.page(2)
+            for method in (last.start_index, last.previous_page_number):
+                with self.assertRaises(NotImplementedError):
+                    method()
+
+    def test_deep_page_is_single_query(self):
+        """Страница по курсору — один запрос, без COUNT(*)."""
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        cursor = paginator.cursor_page().next_cursor
+        with self.assertNumQueries(1):
+            page = paginator.cursor_page(cursor)
+        self.assertEqual([post.pk for post in page], self.expected[10:20])
+
+    def test_broken_cursor_gives_first_page(self):
+        response = self.client.get(
+            reverse('posts:index'), {'cursor': 'broken!'}
+        )
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            self.expected[:10]
+        )
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='timeline_author')
+        cls.old_post = Post.objects.create(
+            author=cls.author, text='Старый пост'
+        )
+
+    def setUp(self):
+        self.client.force_login(self.reader)
+
+    def feed(self):
+        response = self.client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_and_new_posts_are_pushed(self):
+        """Подписка заполняет ленту, новый пост попадает в неё сразу."""
+        self.client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author}
+        ))
+        self.assertEqual(self.feed(), [self.old_post])
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.reader, post=new_post
+            ).exists()
+        )
+
+    def test_unfollow_prunes_timeline(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author}
+        ))
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.reader).exists()
+        )
+        self.assertEqual(self.feed(), [])
+
+
+@override_settings(TIMELINE_PULL_THRESHOLD=1, TIMELINE_PUSH_THRESHOLD=1)
+class HybridTimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='hybrid_reader')
+        cls.other = User.objects.create_user(username='hybrid_other')
+        cls.star = User.objects.create_user(username='star')
+        cls.regular = User.objects.create_user(username='regular')
+
+    def setUp(self):
+        cache.clear()
+        Follow.objects.create(user=self.reader, author=self.star)
+        Follow.objects.create(user=self.other, author=self.star)
+        Follow.objects.create(user=self.reader, author=self.regular)
+        self.client.force_login(self.reader)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_heavy_author_is_pulled_and_merged(self):
+        """Посты «тяжёлого» автора не раскладываются, но сливаются
+        в ленту с разложенными постами в порядке публикации."""
+        posts = [
+            Post.objects.create(author=author, text=f'Пост {i}')
+            for i, author in enumerate(
+                [self.star, self.regular, self.star, self.regular]
+            )
+        ]
+        self.assertFalse(
+            TimelineEntry.objects.filter(author=self.star).exists()
+        )
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']), posts[::-1]
+        )
+
+    def rebalance(self):
+        out = StringIO()
+        with mock.patch('posts.timeline.transaction.on_commit', run_now):
+            call_command('rebalance_timelines', stdout=out)
+        return out.getvalue()
+
+    def test_author_between_thresholds_stays_pulled(self):
+        """Отписка не переключает автора и ничего не раскладывает
+        в запросе; пока подписчиков не меньше нижнего порога, автор
+        остаётся в pull."""
+        post = Post.objects.create(author=self.star, text='Звёздный пост')
+        Follow.objects.filter(user=self.other, author=self.star).delete()
+        self.assertIn('возвращено в push: 0', self.rebalance())
+        self.assertIn(self.star.pk, pull_authors())
+        self.assertFalse(
+            TimelineEntry.objects.filter(author=self.star).exists()
+        )
+        self.assertEqual(
+            list(self.client.get(
+                reverse('posts:follow_index')
+            ).context['page_obj']),
+            [post]
+        )
+
+    @override_settings(TIMELINE_PUSH_THRESHOLD=2)
+    def test_author_below_push_threshold_is_backfilled(self):
+        """Команда возвращает автора ниже нижнего порога в push и
+        раскладывает его посты по лентам оставшихся подписчиков."""
+        post = Post.objects.create(author=self.star, text='Звёздный пост')
+        Follow.objects.filter(user=self.other, author=self.star).delete()
+        self.assertIn('возвращено в push: 1', self.rebalance())
+        self.assertNotIn(self.star.pk, pull_authors())
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(
+                author=self.star
+            ).values_list('user', 'post')),
+            [(self.reader.pk, post.pk)]
+        )
+        new_post = Post.objects.create(author=self.star, text='Новый')
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.reader, post=new_post
+            ).exists()
+        )
+
+    def test_pull_authors_cleared_after_commit(self):
+        """Список «тяжёлых» авторов сбрасывается только после коммита."""
+        self.assertEqual(pull_authors(), {self.star.pk})
+        with mock.patch('posts.timeline.transaction.on_commit') as on_commit:
+            Follow.objects.create(user=self.other, author=self.regular)
+        self.assertEqual(pull_authors(), {self.star.pk})
+        for callback in on_commit.call_args_list:
+            callback[0][0]()
+        self.assertEqual(pull_authors(), {self.star.pk, self.regular.pk})
+
+    def test_feed_stats_command(self):
+        out = StringIO()
+        call_command('feed_stats', user=['hybrid_reader'], stdout=out)
+        self.assertIn('Авторов в pull-режиме: 1', out.getvalue())
+        self.assertIn('hybrid_reader: push', out.getvalue())
+        self.assertIn('pull', out.getvalue())
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='card_author')
+        cls.group = Group.objects.create(title='Старое имя', slug='cards')
+        cls.post = Post.objects.create(
+            author=cls.user, text='Текст карточки', group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cards_fetched_with_one_get_many(self):
+        """Повторная сборка страницы берёт карточки из кэша."""
+        render_cards([self.post])
+        with mock.patch('posts.cards.render_to_string') as render:
+            cards = render_cards([self.post])
+        render.assert_not_called()
+        self.assertIn('Текст карточки', cards[0])
+
+    def test_post_edit_invalidates_card(self):
+        render_cards([self.post])
+        self.post.text = 'Новый текст карточки'
+        self.post.save()
+        self.assertIn('Новый текст карточки', render_cards([self.post])[0])
+
+    def test_group_rename_invalidates_cards(self):
+        render_cards([self.post])
+        self.group.title = 'Новое имя'
+        self.group.save()
+        post = Post.objects.select_related('group').get(pk=self.post.pk)
+        self.assertIn('Новое имя', render_cards([post])[0])
+
+
 class TestPostCache(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -401,3 +662,23 @@ class TestPostCache(TestCase):
             response.content,
             response_new.content
         )
+
+    def test_cache_is_page_aware(self):
+        """Разные страницы не отдают один и тот же кэшированный фрагмент."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Пост номер {i}') for i in range(12)
+        )
+        cache.clear()
+        first = self.guest_client.get(reverse('posts:index'))
+        second = self.guest_client.get(
+            reverse('posts:index'),
+            {'cursor': first.context['page_obj'].next_cursor}
+        )
+        self.assertNotEqual(first.content, second.content)
+
+    def test_new_post_invalidates_cache(self):
+        """Новый пост сразу виден на главной, несмотря на кэш."""
+        self.guest_client.get(reverse('posts:index'))
+        Post.objects.create(author=self.user, text='Свежий пост 777')
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Свежий пост 777')
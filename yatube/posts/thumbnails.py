@@ -0,0 +1,351 @@
+"""
+Заблаговременная нарезка миниатюр картинок постов.
+
+После сохранения поста с новой картинкой все варианты миниатюры (ширины
+settings.POST_THUMBNAIL_WIDTHS в формате по умолчанию и в современных
+форматах) готовятся в отдельном процессе, а шаблонам остаётся только
+найти готовые записи в KVStore sorl-thumbnail.
+
+Списки постов не ходят в KVStore за каждой картинкой: resolve_thumbnails
+достаёт адреса и размеры всех вариантов для всей страницы одним запросом
+и держит их в LRU-кэше процесса. Шаблон отдаёт варианты через <picture>
+и srcset, и браузер сам выбирает формат и ширину.
+"""
+import logging
+import multiprocessing
+import threading
+from collections import OrderedDict, defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore
+
+from core.cache import POST_LIST, bump_version
+
+from .images import has_metadata
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+Thumbnail = namedtuple('Thumbnail', 'url width height')
+# format None — формат миниатюр sorl по умолчанию
+Variant = namedtuple('Variant', 'width format geometry options')
+# sources — пары (MIME-тип, srcset) для <source> в порядке предпочтения;
+# complete — нарезаны все варианты, такую картинку можно кэшировать
+Picture = namedtuple('Picture', 'url width height srcset sources complete')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def variant_formats():
+    """Современные форматы, которые умеет писать установленный Pillow."""
+    Image.init()
+    return [
+        image_format for image_format in settings.POST_THUMBNAIL_FORMATS
+        if image_format in Image.SAVE
+    ]
+
+
+def thumbnail_variants():
+    """Все варианты миниатюры; первый — основной, для <img src>."""
+    width, height = settings.POST_THUMBNAIL_SIZE
+    main = (width, None)
+    variants = []
+    for image_format in [None] + variant_formats():
+        for variant_width in settings.POST_THUMBNAIL_WIDTHS:
+            if (variant_width, image_format) == main:
+                continue
+            variants.append((variant_width, image_format))
+    result = []
+    for variant_width, image_format in [main] + variants:
+        options = dict(settings.POST_THUMBNAIL_OPTIONS)
+        if image_format is not None:
+            options['format'] = image_format
+        variant_height = max(1, round(variant_width * height / width))
+        result.append(Variant(
+            variant_width, image_format,
+            f'{variant_width}x{variant_height}', options
+        ))
+    return result
+
+
+def generate_thumbnails(name):
+    """Готовит все варианты миниатюры для файла name из Post.image."""
+    # Хранилище входит в ключ исходника в KVStore: берём то же, что у поля.
+    source = ImageFile(name, Post._meta.get_field('image').storage)
+    for variant in thumbnail_variants():
+        get_thumbnail(source, variant.geometry, **variant.options)
+
+
+def _setup_worker():
+    import django
+    django.setup()
+
+
+def get_executor():
+    """Пул рабочих процессов, создаётся при первой загрузке картинки.
+
+    Процессы запускаются через spawn: форк унаследовал бы открытые
+    соединения с базой.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_setup_worker,
+            )
+        return _executor
+
+
+def reset_executor(executor):
+    """Выбрасывает сломанный пул (рабочий процесс убит, например, OOM):
+    следующая нарезка создаст новый."""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False)
+
+
+def pending_key(name):
+    return f'thumbnails_pending:{name}'
+
+
+def is_pending(name):
+    return cache.get(pending_key(name)) is not None
+
+
+def _finished(executor, name):
+    def callback(future):
+        cache.delete(pending_key(name))
+        # Списки, закэшированные с оригиналом вместо миниатюр, и их ETag
+        # устарели.
+        bump_version(POST_LIST)
+        error = future.exception()
+        if isinstance(error, BrokenProcessPool):
+            reset_executor(executor)
+        if error is not None:
+            logger.error(
+                'Не удалось нарезать миниатюры %s', name, exc_info=error
+            )
+    return callback
+
+
+def dispatch(name):
+    # Базу в памяти (тесты) другой процесс не увидит, режем на месте.
+    in_memory = (
+        connection.vendor == 'sqlite' and connection.is_in_memory_db()
+    )
+    if settings.THUMBNAIL_WORKERS and not in_memory:
+        executor = get_executor()
+        # Пока рабочий процесс режет, страницы показывают оригинал
+        # и не режут основной вариант сами.
+        cache.set(
+            pending_key(name), True, settings.THUMBNAIL_PENDING_TIMEOUT
+        )
+        try:
+            future = executor.submit(generate_thumbnails, name)
+        except BrokenProcessPool:
+            logger.warning('Пул нарезки миниатюр сломан, режем на месте')
+            reset_executor(executor)
+            cache.delete(pending_key(name))
+        else:
+            future.add_done_callback(_finished(executor, name))
+            return
+    try:
+        generate_thumbnails(name)
+    except Exception:
+        logger.exception('Не удалось нарезать миниатюры %s', name)
+
+
+def schedule_thumbnails(post):
+    """Ставит нарезку миниатюр post.image после фиксации транзакции."""
+    if post.image:
+        name = post.image.name
+        transaction.on_commit(lambda: dispatch(name))
+
+
+class LRUCache:
+    """Потокобезопасный словарь, вытесняющий давно не читанные ключи."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_many(self, keys):
+        found = {}
+        with self.lock:
+            for key in keys:
+                if key in self.data:
+                    self.data.move_to_end(key)
+                    found[key] = self.data[key]
+        return found
+
+    def set_many(self, items):
+        with self.lock:
+            for key, value in items.items():
+                self.data[key] = value
+                self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+resolved = LRUCache(settings.THUMBNAIL_LRU_SIZE)
+
+
+def thumbnail_file(source, geometry, options):
+    """Файл миниатюры, который get_thumbnail создал бы для source.
+
+    Повторяет нормализацию опций из ThumbnailBackend.get_thumbnail,
+    иначе имя и ключ в KVStore не совпадут.
+    """
+    backend = default.backend
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(name, default.storage)
+
+
+def _make_thumbnail(image, geometry, options):
+    """Старый путь шаблонного тега: найти или нарезать прямо сейчас."""
+    try:
+        thumbnail = get_thumbnail(image, geometry, **options)
+        return Thumbnail(thumbnail.url, thumbnail.width, thumbnail.height)
+    except Exception:
+        # Исходника нет или он битый: тег {% thumbnail %} тоже молчал.
+        logger.exception('Не удалось получить миниатюру %s', image)
+        return None
+
+
+def srcset(thumbnails):
+    return ', '.join(
+        f'{thumbnail.url} {thumbnail.width}w'
+        for thumbnail in sorted(set(thumbnails), key=lambda t: t.width)
+    )
+
+
+def build_picture(pairs, found):
+    """Собирает Picture из найденных вариантов одного поста."""
+    by_format = defaultdict(list)
+    for variant, key in pairs:
+        if key in found:
+            by_format[variant.format].append(found[key])
+    main = found[pairs[0][1]]
+    sources = [
+        (Image.MIME[image_format], srcset(by_format[image_format]))
+        for image_format in variant_formats() if by_format[image_format]
+    ]
+    return Picture(
+        main.url, main.width, main.height, srcset(by_format[None]), sources,
+        all(key in found for variant, key in pairs)
+    )
+
+
+def original_picture(post):
+    """Оригинал вместо миниатюры, пока миниатюры режутся."""
+    return Picture(
+        post.image.url, post.image_width, post.image_height, '', [], False
+    )
+
+
+def fetch_stored(keys):
+    """Миниатюры с ключами keys, уже записанные в KVStore."""
+    missing = {add_prefix(key): key for key in keys}
+    return {
+        missing[row.key]: Thumbnail(
+            thumbnail.url, thumbnail.width, thumbnail.height
+        )
+        for row in KVStore.objects.filter(key__in=missing)
+        for thumbnail in (deserialize_image_file(row.value),)
+    }
+
+
+def cut_main_variants(wanted, found, readable):
+    """Режет на месте основные варианты, которых нет в found.
+
+    Возвращает нарезанное и pk постов, миниатюры которых ещё режет
+    рабочий процесс: их не трогаем.
+    """
+    main = thumbnail_variants()[0]
+    cut = {}
+    pending = set()
+    for pk, pairs in wanted.items():
+        key = pairs[0][1]
+        if key in found or pk not in readable:
+            continue
+        if is_pending(readable[pk].image.name):
+            pending.add(pk)
+            continue
+        thumbnail = _make_thumbnail(
+            readable[pk].image, main.geometry, main.options
+        )
+        if thumbnail is not None:
+            cut[key] = thumbnail
+    return cut, pending
+
+
+def resolve_thumbnails(posts):
+    """Возвращает {pk: Picture} для постов с картинками.
+
+    Всё, чего нет в LRU-кэше, ищется в KVStore одним запросом на всю
+    страницу. Если основной вариант ещё не нарезан, а рабочий процесс
+    уже режет миниатюры, отдаётся оригинал; иначе основной вариант
+    режется на месте. Недостающие дополнительные варианты просто
+    не попадают в srcset. Оригинал без метаданных (файл не прочитался
+    при загрузке и при image_metadata) не открывается.
+    """
+    variants = thumbnail_variants()
+    wanted = {}
+    readable = {}
+    for post in posts:
+        if post.image:
+            source = ImageFile(post.image)
+            wanted[post.pk] = [
+                (variant, thumbnail_file(
+                    source, variant.geometry, variant.options
+                ).key)
+                for variant in variants
+            ]
+            if has_metadata(post):
+                readable[post.pk] = post
+    keys = {key for pairs in wanted.values() for variant, key in pairs}
+    found = resolved.get_many(keys)
+    pending = set()
+    if len(found) < len(keys):
+        fetched = fetch_stored(keys - found.keys())
+        found.update(fetched)
+        cut, pending = cut_main_variants(wanted, found, readable)
+        fetched.update(cut)
+        resolved.set_many(fetched)
+        found.update(cut)
+    pictures = {}
+    for pk, pairs in wanted.items():
+        if pairs[0][1] in found:
+            pictures[pk] = build_picture(pairs, found)
+        elif pk in pending:
+            pictures[pk] = original_picture(readable[pk])
+    return pictures
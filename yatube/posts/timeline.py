@@ -0,0 +1,241 @@
+"""
+Лента подписок в гибридном режиме push/pull.
+
+Посты обычных авторов раскладываются по лентам подписчиков при
+публикации (fan-out on write), поэтому их чтение — один проход по индексу
+(user, -pub_date, -post) в таблице TimelineEntry. Посты авторов, у которых
+подписчиков больше TIMELINE_PULL_THRESHOLD, не раскладываются: при чтении
+ленты они выбираются из Post и сливаются с разложенными записями.
+
+Переход в pull происходит сразу, как только подписчиков стало больше
+порога, и запоминается флагом UserStats.timeline_pulled. Обратно в push
+автор возвращается, только когда подписчиков стало меньше
+TIMELINE_PUSH_THRESHOLD: иначе автор на границе порога переключался бы
+на каждой подписке и отписке. Возврат в push раскладывает последние
+посты автора по лентам всех подписчиков — это тысячи строк на читателя,
+поэтому он делается не в запросе, а командой rebalance_timelines.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from core.pagination import MergedCursorPaginator
+from core.utils import page_from_request
+
+from .models import Follow, Post, TimelineEntry, UserStats
+
+BATCH_SIZE = 500
+PULL_AUTHORS_KEY = 'timeline:pull_authors'
+PUSH_KEY = ('pub_date', 'post_id')
+PULL_KEY = ('pub_date', 'pk')
+
+
+def pull_authors():
+    """Авторы, чьи посты читаются при чтении ленты, а не раскладываются."""
+    authors = cache.get(PULL_AUTHORS_KEY)
+    if authors is None:
+        authors = frozenset(
+            UserStats.objects.filter(
+                Q(followers__gt=settings.TIMELINE_PULL_THRESHOLD)
+                | Q(timeline_pulled=True)
+            ).values_list('user_id', flat=True)
+        )
+        # Читатель мог прочитать таблицу до чужого коммита и положить
+        # устаревший список уже после сброса: TTL ограничивает его жизнь.
+        cache.set(
+            PULL_AUTHORS_KEY, authors, settings.TIMELINE_PULL_CACHE_TIMEOUT
+        )
+    return authors
+
+
+def clear_pull_authors():
+    """Сбрасывает список после коммита: сброс до коммита дал бы другим
+    запросам закэшировать ещё старое состояние таблицы."""
+    transaction.on_commit(lambda: cache.delete(PULL_AUTHORS_KEY))
+
+
+def is_pulled(author_id):
+    return author_id in pull_authors()
+
+
+def push_post(post):
+    """Раскладывает новый пост по лентам всех подписчиков автора."""
+    if is_pulled(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id, post_id=post.pk,
+                author_id=post.author_id, pub_date=post.pub_date,
+            )
+            for user_id in followers.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def latest_posts(author_id):
+    return list(
+        Post.objects.filter(author_id=author_id).order_by(
+            '-pub_date', '-pk'
+        ).values_list('pk', 'pub_date')[:settings.TIMELINE_BACKFILL]
+    )
+
+
+def backfill(user_id, author_id, posts=None):
+    """Добавляет в ленту последние посты автора."""
+    if posts is None:
+        posts = latest_posts(author_id)
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(
+                user_id=user_id, post_id=post_id,
+                author_id=author_id, pub_date=pub_date,
+            )
+            for post_id, pub_date in posts
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def prune(user_id, author_id):
+    """Убирает посты автора из ленты."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebalance(author_id):
+    """
+    Переводит автора в pull, если подписчиков стало больше порога,
+    и возвращает, читается ли он при чтении ленты. Обратный переход
+    в запросе не делается, см. repush.
+    """
+    followers, pulled = UserStats.objects.filter(
+        user_id=author_id
+    ).values_list('followers', 'timeline_pulled').first() or (0, False)
+    if pulled or followers <= settings.TIMELINE_PULL_THRESHOLD:
+        return pulled
+    UserStats.objects.filter(user_id=author_id).update(timeline_pulled=True)
+    clear_pull_authors()
+    return True
+
+
+def fan_out(author_id, posts, follows):
+    """Раскладывает posts по лентам подписчиков из follows."""
+    for user_id in follows.values_list('user_id', flat=True).iterator():
+        backfill(user_id, author_id, posts)
+
+
+def repush(author_id):
+    """
+    Возвращает автора в push-режим, если подписчиков стало меньше
+    TIMELINE_PUSH_THRESHOLD. Пока автор в pull, его записи в лентах
+    не читаются, поэтому посты раскладываются до переключения и
+    читатели не видят наполовину заполненных лент. Что изменилось
+    за время раскладки, правится после переключения: новые посты
+    и новые подписчики дораскладываются, а записи отписавшихся
+    удаляются.
+    """
+    last_post = Post.objects.filter(
+        author_id=author_id
+    ).order_by('-pk').values_list('pk', flat=True).first() or 0
+    last_follow = Follow.objects.filter(
+        author_id=author_id
+    ).order_by('-pk').values_list('pk', flat=True).first() or 0
+    follows = Follow.objects.filter(author_id=author_id)
+    fan_out(author_id, latest_posts(author_id), follows)
+    with transaction.atomic():
+        switched = UserStats.objects.filter(
+            user_id=author_id, timeline_pulled=True,
+            followers__lt=settings.TIMELINE_PUSH_THRESHOLD,
+        ).update(timeline_pulled=False)
+        if switched:
+            clear_pull_authors()
+    if not switched:
+        return False
+    fan_out(author_id, list(
+        Post.objects.filter(
+            author_id=author_id, pk__gt=last_post
+        ).values_list('pk', 'pub_date')
+    ), follows.filter(pk__lte=last_follow))
+    fan_out(
+        author_id, latest_posts(author_id),
+        follows.filter(pk__gt=last_follow)
+    )
+    TimelineEntry.objects.filter(author_id=author_id).exclude(
+        user_id__in=follows.values('user_id')
+    ).delete()
+    return True
+
+
+def rebalance_all():
+    """Переводит в pull всех авторов выше порога и возвращает в push
+    тех, кто опустился ниже TIMELINE_PUSH_THRESHOLD.
+    Возвращает числа переведённых в pull и в push."""
+    pulled = UserStats.objects.filter(
+        followers__gt=settings.TIMELINE_PULL_THRESHOLD,
+        timeline_pulled=False,
+    ).update(timeline_pulled=True)
+    if pulled:
+        clear_pull_authors()
+    candidates = UserStats.objects.filter(
+        timeline_pulled=True,
+        followers__lt=settings.TIMELINE_PUSH_THRESHOLD,
+    ).values_list('user_id', flat=True)
+    pushed = sum(repush(author_id) for author_id in list(candidates))
+    return pulled, pushed
+
+
+def follow_added(user_id, author_id):
+    if not rebalance(author_id):
+        backfill(user_id, author_id)
+
+
+def follow_removed(user_id, author_id):
+    prune(user_id, author_id)
+    rebalance(author_id)
+
+
+def timeline_sources(user):
+    """Источники ленты: разложенные записи и по источнику на каждого
+    «тяжёлого» автора. Отдельный источник на автора читает индекс
+    (author, pub_date) с LIMIT, а author_id IN (...) пришлось бы
+    сортировать по всем постам этих авторов."""
+    heavy = pull_authors()
+    pushed = TimelineEntry.objects.filter(user=user)
+    if not heavy:
+        return pushed, []
+    followed = Follow.objects.filter(
+        user=user, author_id__in=heavy
+    ).values_list('author_id', flat=True)
+    pulled = [
+        Post.objects.filter(author_id=author_id) for author_id in followed
+    ]
+    return pushed.exclude(author_id__in=heavy), pulled
+
+
+def timeline_page(request, user, per_page, posts=None):
+    """Страница ленты: k-way слияние источников по курсору,
+    затем одна выборка постов по первичному ключу из posts
+    (по умолчанию — с автором и группой)."""
+    pushed, pulled = timeline_sources(user)
+    sources = [(pushed, PUSH_KEY)]
+    sources += [(queryset, PULL_KEY) for queryset in pulled]
+    page = page_from_request(
+        request, MergedCursorPaginator(sources, per_page)
+    )
+    if posts is None:
+        posts = Post.objects.select_related('author', 'group')
+    posts = posts.in_bulk(
+        [post_id for _, post_id in page.object_list]
+    )
+    page.object_list = [
+        posts[post_id] for _, post_id in page.object_list
+        if post_id in posts
+    ]
+    return page
@@ -0,0 +1,131 @@
+"""
+Популярное: группы и посты с наибольшей активностью за скользящее окно.
+
+Активность считается в кэше, а не запросами GROUP BY по Post и Comment.
+Окно TRENDING_WINDOW делится на корзины по TRENDING_BUCKET секунд.
+Событие (новый пост в группе, комментарий к посту) увеличивает счётчик
+объекта в текущей корзине и обновляет словарь лидеров корзины — не
+больше TRENDING_CAPACITY объектов. Запись стоит O(1): incr, get и set.
+
+Чтение берёт словари лидеров всех корзин окна одним get_many и
+складывает их; самая старая корзина учитывается с долей, которая ещё
+попадает в окно, поэтому окно скользит плавно, а не скачком раз в
+корзину. Корзины сами истекают по TTL. Словарь лидеров обновляется без
+блокировки между процессами, поэтому при одновременных событиях
+счёт может немного отставать — для «популярного» это допустимо.
+"""
+import heapq
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Group, Post
+
+# Вклад событий в популярность группы
+POST_WEIGHT = 3
+COMMENT_WEIGHT = 1
+
+_lock = threading.Lock()
+
+
+class SlidingWindowCounter:
+    """Счётчики объектов одного вида за скользящее окно."""
+
+    def __init__(self, name):
+        self.name = name
+
+    @property
+    def buckets(self):
+        return max(1, settings.TRENDING_WINDOW // settings.TRENDING_BUCKET)
+
+    def bucket_key(self, bucket):
+        return f'trending:{self.name}:{bucket}'
+
+    def hit(self, item_id, amount=1, now=None):
+        now = time.time() if now is None else now
+        bucket = int(now // settings.TRENDING_BUCKET)
+        top_key = self.bucket_key(bucket)
+        count_key = f'{top_key}:{item_id}'
+        # Корзина живёт, пока попадает в окно.
+        timeout = settings.TRENDING_WINDOW + settings.TRENDING_BUCKET
+        cache.add(count_key, 0, timeout)
+        try:
+            count = cache.incr(count_key, amount)
+        except ValueError:
+            # Ключ вытеснили между add и incr.
+            cache.set(count_key, amount, timeout)
+            count = amount
+        with _lock:
+            top = cache.get(top_key) or {}
+            top[item_id] = count
+            if len(top) > settings.TRENDING_CAPACITY:
+                del top[min(top, key=top.get)]
+            cache.set(top_key, top, timeout)
+
+    def top(self, size, now=None):
+        """До size пар (id, активность), самые активные первыми."""
+        now = time.time() if now is None else now
+        position = now / settings.TRENDING_BUCKET
+        current = int(position)
+        keys = {
+            self.bucket_key(bucket): bucket
+            for bucket in range(current - self.buckets, current + 1)
+        }
+        # Самая старая корзина уже частично вышла из окна.
+        oldest = current - self.buckets
+        weights = {oldest: 1 - (position - current)}
+        scores = defaultdict(float)
+        for key, top in cache.get_many(keys).items():
+            weight = weights.get(keys[key], 1)
+            for item_id, count in top.items():
+                scores[item_id] += weight * count
+        return heapq.nlargest(
+            size, ((item_id, score) for item_id, score in scores.items()
+                   if score > 0),
+            key=lambda item: (item[1], item[0])
+        )
+
+
+def current_bucket():
+    """Номер текущей корзины: с её сменой популярное меняется само,
+    без новых событий."""
+    return int(time.time() // settings.TRENDING_BUCKET)
+
+
+groups = SlidingWindowCounter('groups')
+posts = SlidingWindowCounter('posts')
+
+
+def group_posts(group_id):
+    return SlidingWindowCounter(f'group:{group_id}:posts')
+
+
+def post_created(post):
+    if post.group_id is not None:
+        groups.hit(post.group_id, POST_WEIGHT)
+
+
+def comment_created(comment):
+    post = comment.post
+    posts.hit(post.pk)
+    if post.group_id is not None:
+        groups.hit(post.group_id, COMMENT_WEIGHT)
+        group_posts(post.group_id).hit(post.pk)
+
+
+def trending_groups():
+    top = groups.top(settings.TRENDING_SIZE)
+    found = Group.objects.in_bulk([group_id for group_id, score in top])
+    return [found[group_id] for group_id, score in top if group_id in found]
+
+
+def trending_posts(group=None):
+    counter = posts if group is None else group_posts(group.pk)
+    top = counter.top(settings.TRENDING_SIZE)
+    found = Post.objects.select_related('author').in_bulk(
+        [post_id for post_id, score in top]
+    )
+    return [found[post_id] for post_id, score in top if post_id in found]
@@ -10,7 +10,13 @@ urlpatterns = [
         views.add_comment,
         name='add_comment'
     ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     path('follow/', views.follow_index, name='follow_index'),
+    path('export/', views.export_data, name='export_data'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
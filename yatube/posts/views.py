@@ -1,50 +1,137 @@
+from datetime import datetime, timezone
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
+from django.views.decorators.http import condition
 
+from core.cache import (COMMENT_COUNTS, POST_LIST, comment_list,
+                        follow_list, follow_suggestions,
+                        fragment_cache_context, last_changed, version_etag)
 from core.utils import paginate
 
+from .counters import stats_for
+from .export import FORMATS, export_response
 from .forms import CommentForm, PostForm
-from .models import Comment, Follow, Group, Post, User
+from .models import Comment, Follow, Group, Post, User, UserStats
+from .suggestions import suggestions_for
+from .thumbnails import resolve_thumbnails, schedule_thumbnails
+from .timeline import timeline_page
+from .trending import current_bucket, trending_groups, trending_posts
+
+COMMENTS_PER_PAGE = 20
+# Списки с «Популярным» зависят от постов, комментариев и корзины окна
+LIST_NAMESPACES = (POST_LIST, COMMENT_COUNTS)
+
+
+# Свежесть страниц для condition(): ETag и Last-Modified считаются по
+# версиям кэша (core.cache), которые меняются вместе с данными, без
+# рендера. Страница зависит и от того, кто смотрит (шапка, форма
+# комментария, подписка), поэтому в ETag входит id пользователя.
+
+def list_etag(request, *args, **kwargs):
+    return version_etag(
+        request, *LIST_NAMESPACES, extra=(request.user.pk, current_bucket())
+    )
+
+
+def list_last_modified(request, *args, **kwargs):
+    changed = last_changed(*LIST_NAMESPACES)
+    if changed is None:
+        return None
+    bucket_start = datetime.fromtimestamp(
+        current_bucket() * settings.TRENDING_BUCKET, tz=timezone.utc
+    )
+    return max(changed, bucket_start)
 
 
+def profile_etag(request, username):
+    """Один запрос по индексу: счётчики автора меняются и от чужих
+    подписок, версии этого не видят. Поэтому и Last-Modified у профиля
+    нет."""
+    stats = UserStats.objects.filter(user__username=username).values_list(
+        'posts', 'followers', 'following'
+    ).first()
+    if stats is None:
+        return None
+    namespaces = [POST_LIST]
+    if request.user.is_authenticated:
+        namespaces += [
+            follow_list(request.user.pk), follow_suggestions(request.user.pk)
+        ]
+    return version_etag(
+        request, *namespaces, extra=(request.user.pk, *stats)
+    )
+
+
+def post_etag(request, post_id):
+    return version_etag(
+        request, POST_LIST, comment_list(post_id), extra=(request.user.pk,)
+    )
+
+
+def post_last_modified(request, post_id):
+    return last_changed(POST_LIST, comment_list(post_id))
+
+
+@condition(etag_func=list_etag, last_modified_func=list_last_modified)
 def index(request):
-    post_list = Post.objects.all()
+    post_list = Post.objects.select_related('author', 'group')
     page_obj = paginate(request, post_list, 10)
     context = {
         'page_obj': page_obj,
+        'trending_groups': trending_groups(),
+        'trending_posts': trending_posts(),
+        **fragment_cache_context(POST_LIST),
     }
     return render(request, 'posts/index.html', context)
 
 
+@condition(etag_func=list_etag, last_modified_func=list_last_modified)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
+    post_list = group.posts.select_related('author', 'group')
     page_obj = paginate(request, post_list, 10)
     context = {
         'group': group,
         'page_obj': page_obj,
+        'trending_posts': trending_posts(group),
+        **fragment_cache_context(POST_LIST),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@condition(etag_func=profile_etag)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
     following = (
         request.user.is_authenticated
         and Follow.objects.filter(user=request.user, author=author).exists()
     )
-    post_list = Post.objects.filter(author=author)
+    post_list = Post.objects.filter(author=author).select_related(
+        'author', 'group'
+    )
     page_obj = paginate(request, post_list, 10)
     context = {
         'author': author,
+        'stats': stats_for(author),
         'page_obj': page_obj,
         'following': following,
+        'suggestions': suggestions_for(request.user),
+        **fragment_cache_context(POST_LIST),
     }
     return render(request, 'posts/profile.html', context)
 
 
 @login_required
 def add_comment(request, post_id):
+    """На обычную отправку формы — редирект на пост. На XHR/fetch — JSON
+    с HTML нового комментария и числом комментариев, без повторного
+    рендера всей страницы."""
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
@@ -52,23 +139,59 @@ def add_comment(request, post_id):
         comment.author = request.user
         comment.post = post
         comment.save()
+        if request.is_ajax():
+            return JsonResponse({
+                'html': render_to_string(
+                    'includes/comment.html', {'comment': comment}, request
+                ),
+                'count': Post.objects.values_list(
+                    'comment_count', flat=True
+                ).get(pk=post_id),
+            })
+    elif request.is_ajax():
+        return JsonResponse({'errors': form.errors}, status=400)
     return redirect('posts:post_detail', post_id=post_id)
 
 
+def comment_page(request, post_id):
+    """Страница комментариев поста по курсору из запроса: сначала новые,
+    авторы подгружены тем же запросом."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    )
+    return paginate(request, comments, COMMENTS_PER_PAGE)
+
+
+@condition(etag_func=post_etag, last_modified_func=post_last_modified)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id
+    )
     form = CommentForm(request.POST or None)
-    comments = Comment.objects.filter(post=post)
-    count = Post.objects.filter(author=post.author).count()
+    comments = comment_page(request, post.pk)
+    count = stats_for(post.author).posts
     context = {
         'post': post,
         'form': form,
         'comments': comments,
-        'count': count
+        'count': count,
+        'thumbnail': resolve_thumbnails([post]).get(post.pk),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    """Следующая пачка комментариев HTML-фрагментом для подгрузки
+    со страницы поста."""
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    context = {
+        'post_id': post_id,
+        'comments': comment_page(request, post_id),
+    }
+    return render(request, 'includes/comments.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(
@@ -79,6 +202,7 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        schedule_thumbnails(post)
         return redirect('posts:profile', post.author.username)
     return render(request, 'posts/create_post.html', {'form': form})
 
@@ -95,7 +219,9 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid():
-        form.save()
+        post = form.save()
+        if 'image' in form.changed_data:
+            schedule_thumbnails(post)
         return redirect('posts:post_detail', post_id=post_id)
     context = {
         'post': post,
@@ -107,10 +233,11 @@ def post_edit(request, post_id):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginate(request, post_list, 10)
+    page_obj = timeline_page(request, request.user, 10)
     context = {
         'page_obj': page_obj,
+        'suggestions': suggestions_for(request.user),
+        **fragment_cache_context(POST_LIST, follow_list(request.user.pk)),
     }
     return render(request, 'posts/follow.html', context)
 
@@ -118,15 +245,8 @@ def follow_index(request):
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    if (
-        (
-            not Follow.objects.filter(
-                user=request.user, author=author
-            ).exists()
-        ) and (request.user != author)
-    ):
-        new_follow = Follow.objects.create(user=request.user, author=author)
-        new_follow.save()
+    if request.user != author:
+        Follow.objects.follow(request.user.pk, author.pk)
     return redirect('posts:profile', username=username)
 
 
@@ -134,5 +254,19 @@ def profile_follow(request, username):
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     if request.user != author:
-        Follow.objects.filter(user=request.user, author=author).delete()
+        Follow.objects.unfollow(request.user.pk, author.pk)
     return redirect('posts:profile', username=username)
+
+
+@login_required
+def export_data(request):
+    """Свои посты и комментарии файлом: ?format=ndjson (по умолчанию)
+    или csv."""
+    export_format = request.GET.get('format', 'ndjson')
+    if export_format not in FORMATS:
+        raise Http404
+    user = request.user
+    return export_response(
+        [(user.pk, user.username)], export_format,
+        f'yatube-{user.username}', request.build_absolute_uri
+    )
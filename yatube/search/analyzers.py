@@ -0,0 +1,174 @@
+"""
+Анализаторы текста для поискового индекса.
+
+Анализатор превращает текст в список терминов: слова разбиваются
+по \\w+, приводятся к одному регистру и нормализуются. Одни и те же
+термины пишутся в индекс и ищутся в запросе, поэтому для подсветки
+совпадений анализатор умеет выдавать и позиции слов в исходном тексте.
+Какой анализатор использовать, задаёт settings.SEARCH_ANALYZER.
+"""
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+WORD_RE = re.compile(r'\w+')
+
+
+class Analyzer:
+    """Разбивает текст на слова и сводит регистр."""
+
+    def normalize(self, word):
+        return word.casefold()
+
+    def tokens(self, text):
+        """(start, end, термин) для каждого слова text."""
+        for match in WORD_RE.finditer(text):
+            yield match.start(), match.end(), self.normalize(match.group())
+
+    def analyze(self, text):
+        return [term for start, end, term in self.tokens(text)]
+
+
+class RussianAnalyzer(Analyzer):
+    """Сводит регистр, заменяет ё на е и отрезает окончания русских слов
+    стеммером Snowball; слова не на кириллице только сводятся по
+    регистру. Буквы дореформенной орфографии (в dump.json дневники
+    написаны ею) заменяются современными, а конечный ъ отбрасывается."""
+
+    def normalize(self, word):
+        return normalize_russian(word)
+
+
+@lru_cache(maxsize=None)
+def load_analyzer(path):
+    return import_string(path)()
+
+
+def get_analyzer():
+    return load_analyzer(settings.SEARCH_ANALYZER)
+
+
+# Стеммер Snowball для русского языка:
+# https://snowballstem.org/algorithms/russian/stemmer.html
+
+CYRILLIC_RE = re.compile('[а-я]')
+RUSSIAN_LETTERS = str.maketrans('ёѣіѵѳ', 'ееииф')
+VOWELS = frozenset('аеиоуыэюя')
+# Окончания первой группы должны идти после «а» или «я»
+AFTER_A = ('а', 'я')
+
+PERFECTIVE_GERUND = {
+    **dict.fromkeys(('в', 'вши', 'вшись'), AFTER_A),
+    **dict.fromkeys(('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'), ()),
+}
+ADJECTIVE = dict.fromkeys((
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+), ())
+PARTICIPLE = {
+    **dict.fromkeys(('ем', 'нн', 'вш', 'ющ', 'щ'), AFTER_A),
+    **dict.fromkeys(('ивш', 'ывш', 'ующ'), ()),
+}
+REFLEXIVE = dict.fromkeys(('ся', 'сь'), ())
+VERB = {
+    **dict.fromkeys((
+        'ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но',
+        'ет', 'ют', 'ны', 'ть', 'ешь', 'нно',
+    ), AFTER_A),
+    **dict.fromkeys((
+        'ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей',
+        'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят',
+        'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю',
+    ), ()),
+}
+NOUN = dict.fromkeys((
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+    'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам',
+    'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+    'ья', 'я',
+), ())
+DERIVATIONAL = dict.fromkeys(('ост', 'ость'), ())
+SUPERLATIVE = dict.fromkeys(('ейш', 'ейше'), ())
+STEM_CACHE_SIZE = 100000
+
+
+def _after_vowel_consonant(word, start):
+    """Начало области после первой пары «гласная, согласная» от start."""
+    for i in range(start + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            return i + 1
+    return len(word)
+
+
+def _strip(word, limit, endings):
+    """Отрезает самое длинное окончание из endings, лежащее не левее
+    limit. Как в among у Snowball, более короткие окончания не
+    пробуются, если для самого длинного не выполнено условие.
+    Возвращает None, если отрезать нечего."""
+    longest = max(map(len, endings))
+    for size in range(min(longest, len(word) - limit), 0, -1):
+        ending = word[-size:]
+        if ending not in endings:
+            continue
+        start = len(word) - size
+        preceded = endings[ending]
+        if preceded and (start <= limit or word[start - 1] not in preceded):
+            return None
+        return word[:start]
+    return None
+
+
+@lru_cache(maxsize=STEM_CACHE_SIZE)
+def normalize_russian(word):
+    """Термин для слова в исходном написании. Частые слова повторяются
+    постоянно, поэтому результаты кэшируются."""
+    word = word.casefold().translate(RUSSIAN_LETTERS)
+    if CYRILLIC_RE.search(word):
+        return stem_russian(word.rstrip('ъ') or word)
+    return word
+
+
+def _strip_inflection(word, rv):
+    """Шаг 1: деепричастие, иначе возвратная частица и затем
+    прилагательное/причастие, глагол или существительное."""
+    stem = _strip(word, rv, PERFECTIVE_GERUND)
+    if stem is not None:
+        return stem
+    word = _strip(word, rv, REFLEXIVE) or word
+    stem = _strip(word, rv, ADJECTIVE)
+    if stem is not None:
+        return _strip(stem, rv, PARTICIPLE) or stem
+    for endings in (VERB, NOUN):
+        stem = _strip(word, rv, endings)
+        if stem is not None:
+            return stem
+    return word
+
+
+def stem_russian(word):
+    """Основа слова в нижнем регистре с «е» вместо «ё»."""
+    rv = len(word)
+    for i, letter in enumerate(word):
+        if letter in VOWELS:
+            rv = i + 1
+            break
+    r2 = _after_vowel_consonant(word, _after_vowel_consonant(word, 0))
+
+    word = _strip_inflection(word, rv)
+    # Шаг 2
+    if word.endswith('и') and len(word) > rv:
+        word = word[:-1]
+    # Шаг 3: словообразовательный суффикс целиком в R2.
+    word = _strip(word, max(rv, r2), DERIVATIONAL) or word
+    # Шаг 4: превосходная степень, двойное «н», мягкий знак.
+    stem = _strip(word, rv, SUPERLATIVE)
+    if stem is not None:
+        word = stem
+    if word.endswith('нн') and len(word) - 2 >= rv:
+        word = word[:-1]
+    elif stem is None and word.endswith('ь') and len(word) > rv:
+        word = word[:-1]
+    return word
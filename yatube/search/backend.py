@@ -0,0 +1,230 @@
+"""
+Полнотекстовый поиск по постам на SQLite FTS5.
+
+В виртуальной таблице search_post (rowid = id поста) лежат не сами
+тексты, а термины, которые выдал анализатор из search.analyzers: слова
+в нижнем регистре, для русского — основы без окончаний. Сигналы обновляют
+таблицу вместе с сохранением и удалением поста. Запрос пользователя
+проходит через тот же анализатор и превращается в безопасное
+FTS5-выражение, результаты ранжируются по bm25 и листаются
+keyset-курсором по (ранг, id), поэтому дальние страницы стоят столько же,
+сколько первая. Фрагменты с подсветкой строятся по исходному тексту поста.
+
+bm25 в FTS5 не умеет отбрасывать кандидатов: он считает IDF, обходя весь
+список документов каждого слова, и оценивает каждое совпадение. Поэтому
+перед ранжированием дешёвые проверки с LIMIT выясняют, не слишком ли
+часты слова (SEARCH_RANKED_TERM_DOCS) и совпадений
+(SEARCH_RANKED_MATCHES). Для слишком общих запросов выдача идёт от новых
+постов к старым: у частых слов IDF около нуля, и bm25 почти ничего
+не различает.
+"""
+from collections import namedtuple
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from core.pagination import FORWARD, CursorPaginator
+from posts.models import Post
+
+from .analyzers import get_analyzer
+
+TABLE = 'search_post'
+SNIPPET_TOKENS = 16
+REBUILD_BATCH_SIZE = 1000
+
+Hit = namedtuple('Hit', 'rank post_id')
+
+
+def match_terms(query):
+    """Термины запроса без повторов, в порядке появления."""
+    return list(dict.fromkeys(get_analyzer().analyze(query)))
+
+
+def quote(term):
+    """Каждый термин уходит в FTS5 фразой в кавычках, так что операторы
+    FTS5 из ввода не работают. Префиксный поиск не используется: FTS5
+    сливает для него списки всех подходящих слов, и «к*» на большом
+    индексе стоит сотни миллисекунд."""
+    return f'"{term}"'
+
+
+def match_expression(query):
+    """FTS5-выражение для query; пустой ввод даёт пустую строку."""
+    return ' '.join(quote(term) for term in match_terms(query))
+
+
+def index_terms(text):
+    return ' '.join(get_analyzer().analyze(text))
+
+
+def index_post(post_id, text):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post_id])
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, terms) VALUES (%s, %s)',
+            [post_id, index_terms(text)]
+        )
+
+
+def unindex_post(post_id):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post_id])
+
+
+def fill(rows, batch_size=REBUILD_BATCH_SIZE):
+    """Индексирует пары (id, текст) пачками по batch_size, возвращает
+    число записей."""
+    rows = iter(rows)
+    count = 0
+    with connection.cursor() as cursor:
+        while True:
+            batch = [
+                (post_id, index_terms(text))
+                for post_id, text in islice(rows, batch_size)
+            ]
+            if not batch:
+                return count
+            cursor.executemany(
+                f'INSERT INTO {TABLE} (rowid, terms) VALUES (%s, %s)', batch
+            )
+            count += len(batch)
+
+
+def rebuild():
+    """Перестраивает индекс по таблице постов, возвращает число записей.
+    Нужен и после смены settings.SEARCH_ANALYZER."""
+    rows = Post.objects.order_by().values_list('id', 'text')
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE}')
+        return fill(rows.iterator(chunk_size=REBUILD_BATCH_SIZE))
+
+
+def filter_matching(queryset, query):
+    """Посты queryset, подходящие под query. Не pk__in=RawSQL(...):
+    Django оборачивает RawSQL во вторые скобки, и SQLite читает
+    «IN ((SELECT ...))» как скалярный подзапрос — одну строку."""
+    column = '{}.{}'.format(
+        connection.ops.quote_name(queryset.model._meta.db_table),
+        connection.ops.quote_name(queryset.model._meta.pk.column),
+    )
+    return queryset.extra(
+        where=[
+            f'{column} IN (SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s)'
+        ],
+        params=[match_expression(query)],
+    )
+
+
+def snippet(text, terms, size=SNIPPET_TOKENS):
+    """Фрагмент text из size слов вокруг первого совпадения с terms;
+    совпавшие слова обёрнуты в <mark>, остальное экранировано."""
+    terms = set(terms)
+    tokens = list(get_analyzer().tokens(text))
+    first = next(
+        (i for i, token in enumerate(tokens) if token[2] in terms), 0
+    )
+    start = max(0, min(first - size // 4, len(tokens) - size))
+    window = tokens[start:start + size]
+    if not window:
+        return ''
+    # Знаки между словами остаются с соседними словами, а у краёв
+    # текста — целиком.
+    position = tokens[start - 1][1] if start else 0
+    parts = []
+    for token_start, token_end, term in window:
+        parts.append(escape(text[position:token_start]))
+        word = escape(text[token_start:token_end])
+        parts.append(f'<mark>{word}</mark>' if term in terms else word)
+        position = token_end
+    end = start + size
+    parts.append(escape(
+        text[position:tokens[end][0] if end < len(tokens) else None]
+    ))
+    result = ''.join(parts).strip()
+    if start:
+        result = '…' + result
+    if end < len(tokens):
+        result += '…'
+    return mark_safe(result)
+
+
+def probe(expression, limit):
+    """Число совпадений, но не больше limit + 1: обход по rowid без
+    ранжирования, стоит O(limit)."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT count(*) FROM (SELECT rowid FROM {TABLE} '
+            f'WHERE {TABLE} MATCH %s LIMIT %s)',
+            [expression, limit + 1]
+        )
+        return cursor.fetchone()[0]
+
+
+def can_rank(terms):
+    """Уложится ли bm25 по terms в лимиты SEARCH_RANKED_*."""
+    matches = settings.SEARCH_RANKED_MATCHES
+    term_docs = settings.SEARCH_RANKED_TERM_DOCS
+    if probe(' '.join(map(quote, terms)), matches) > matches:
+        return False
+    return all(probe(quote(term), term_docs) <= term_docs for term in terms)
+
+
+def search_hits(expression, values, direction, limit, ranked=True):
+    """До limit совпадений после ключа values. bm25 в FTS5 отрицательный:
+    чем меньше rank, тем лучше совпадение; при равенстве новее — выше.
+    Без ранжирования rank у всех 0 и порядок — от новых к старым."""
+    rank = 'rank' if ranked else '0.0'
+    forward = direction == FORWARD
+    rank_after, id_after = ('>', '<') if forward else ('<', '>')
+    keyset = ''
+    params = [expression]
+    if values is not None:
+        keyset = (
+            f'AND ({rank} {rank_after} %s '
+            f'OR ({rank} = %s AND rowid {id_after} %s))'
+        )
+        params += [values[0], values[0], values[1]]
+    order = (
+        f'{rank}, rowid DESC' if forward else f'{rank} DESC, rowid'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT {rank}, rowid FROM {TABLE} '
+            f'WHERE {TABLE} MATCH %s {keyset} '
+            f'ORDER BY {order} LIMIT %s',
+            params + [limit]
+        )
+        return [Hit(*row) for row in cursor.fetchall()]
+
+
+class SearchPaginator(CursorPaginator):
+    """Keyset-пагинатор по выдаче FTS5: ключ — (rank, id поста)."""
+    key = ('rank', 'post_id')
+
+    def __init__(self, query, per_page):
+        self.terms = match_terms(query)
+        self.ranked = None
+        super().__init__(' '.join(map(quote, self.terms)), per_page)
+
+    def parse_value(self, name, value):
+        return float(value) if name == 'rank' else int(value)
+
+    def serialize_value(self, value):
+        # repr() у float восстанавливается без потери точности.
+        return repr(value)
+
+    def fetch(self, values, direction, limit):
+        if not self.object_list:
+            return []
+        if self.ranked is None:
+            self.ranked = can_rank(self.terms)
+        return search_hits(
+            self.object_list, values, direction, limit, self.ranked
+        )
+
+    def number_page(self, number):
+        return self.cursor_page()
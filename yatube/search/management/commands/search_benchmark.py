@@ -0,0 +1,115 @@
+import json
+import random
+import sqlite3
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+BASELINE_ANALYZER = 'search.analyzers.Analyzer'
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет скорость индексации: тексты постов из дампа '
+        'размножаются до --scale копий (в каждой копии слова поста '
+        'перемешаны) и индексируются во временную FTS5-таблицу в памяти.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dump', default=str(Path(settings.BASE_DIR) / 'dump.json'),
+            help='Дамп manage.py dumpdata с постами.'
+        )
+        parser.add_argument(
+            '--scale', type=int, default=100,
+            help='Во сколько раз размножить корпус.'
+        )
+        parser.add_argument(
+            '--analyzer', action='append', dest='analyzers', default=[],
+            help='Путь к классу анализатора (можно несколько). По '
+                 'умолчанию — базовый и settings.SEARCH_ANALYZER.'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        texts = self.load_texts(options['dump'])
+        corpus = self.scale(texts, options['scale'], options['seed'])
+        size = sum(len(text.encode()) for text in corpus) / 2 ** 20
+        self.stdout.write(
+            f'Корпус: {len(texts)} постов × {options["scale"]} = '
+            f'{len(corpus)} документов, {size:.1f} МБ'
+        )
+        paths = options['analyzers'] or [
+            BASELINE_ANALYZER, settings.SEARCH_ANALYZER
+        ]
+        for path in dict.fromkeys(paths):
+            try:
+                analyzer = import_string(path)()
+            except ImportError as error:
+                raise CommandError(error)
+            self.measure(path, analyzer, corpus, size, options['batch_size'])
+
+    def load_texts(self, path):
+        try:
+            with open(path, encoding='utf-8') as dump:
+                objects = json.load(dump)
+        except (OSError, ValueError) as error:
+            raise CommandError(f'Не удалось прочитать {path}: {error}')
+        texts = [
+            obj['fields']['text'] for obj in objects
+            if obj.get('model') == 'posts.post'
+        ]
+        if not texts:
+            raise CommandError(f'В {path} нет постов')
+        return texts
+
+    def scale(self, texts, times, seed):
+        """Первая копия — исходные тексты, в остальных слова каждого поста
+        перемешаны: словарь и длины те же, а документы разные."""
+        rng = random.Random(seed)
+        corpus = list(texts)
+        for _ in range(times - 1):
+            for text in texts:
+                words = text.split()
+                rng.shuffle(words)
+                corpus.append(' '.join(words))
+        return corpus
+
+    def measure(self, path, analyzer, corpus, size, batch_size):
+        db = sqlite3.connect(':memory:')
+        db.execute(
+            "CREATE VIRTUAL TABLE bench USING fts5("
+            "terms, tokenize = 'unicode61 remove_diacritics 0')"
+        )
+        analyze_time = insert_time = 0
+        terms = set()
+        for start in range(0, len(corpus), batch_size):
+            began = time.perf_counter()
+            batch = [
+                (rowid, analyzer.analyze(text))
+                for rowid, text in enumerate(
+                    corpus[start:start + batch_size], start + 1
+                )
+            ]
+            rows = [(rowid, ' '.join(words)) for rowid, words in batch]
+            analyzed = time.perf_counter()
+            db.executemany(
+                'INSERT INTO bench (rowid, terms) VALUES (?, ?)', rows
+            )
+            db.commit()
+            insert_time += time.perf_counter() - analyzed
+            analyze_time += analyzed - began
+            for rowid, words in batch:
+                terms.update(words)
+        db.close()
+        total = analyze_time + insert_time
+        self.stdout.write(
+            f'{path}: {len(corpus) / total:.0f} док/с, '
+            f'{size / total:.2f} МБ/с; анализ {analyze_time:.2f} с, '
+            f'вставка в FTS5 {insert_time:.2f} с, '
+            f'различных терминов {len(terms)}'
+        )
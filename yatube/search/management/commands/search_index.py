@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from search.backend import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        'Перестраивает полнотекстовый индекс постов, например после '
+        'загрузки данных в обход сигналов (loaddata, bulk_create).'
+    )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Проиндексировано постов: {rebuild()}')
@@ -0,0 +1,49 @@
+from django.db import migrations
+
+from search.analyzers import get_analyzer
+
+BATCH_SIZE = 1000
+
+
+def fill_terms(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    analyzer = get_analyzer()
+    rows = Post.objects.order_by().values_list('id', 'text')
+    batch = []
+    with schema_editor.connection.cursor() as cursor:
+        for post_id, text in rows.iterator(chunk_size=BATCH_SIZE):
+            batch.append((post_id, ' '.join(analyzer.analyze(text))))
+            if len(batch) == BATCH_SIZE:
+                cursor.executemany(
+                    'INSERT INTO search_post (rowid, terms) VALUES (%s, %s)',
+                    batch
+                )
+                batch = []
+        cursor.executemany(
+            'INSERT INTO search_post (rowid, terms) VALUES (%s, %s)', batch
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                'DROP TABLE search_post',
+                "CREATE VIRTUAL TABLE search_post USING fts5("
+                "terms, tokenize = 'unicode61 remove_diacritics 0')",
+            ],
+            reverse_sql=[
+                'DROP TABLE search_post',
+                "CREATE VIRTUAL TABLE search_post USING fts5("
+                "text, tokenize = 'unicode61 remove_diacritics 0')",
+                'INSERT INTO search_post (rowid, text) '
+                'SELECT id, text FROM posts_post',
+            ],
+        ),
+        migrations.RunPython(fill_terms, migrations.RunPython.noop),
+    ]
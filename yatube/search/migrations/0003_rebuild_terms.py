@@ -0,0 +1,24 @@
+from django.db import migrations
+
+from search.backend import REBUILD_BATCH_SIZE, TABLE, fill
+
+
+def rebuild_terms(apps, schema_editor):
+    # Стеммер стал отрезать окончания деепричастий длиннее четырёх букв
+    # («-ившись»): старые термины в индексе с запросами не совпадут.
+    Post = apps.get_model('posts', 'Post')
+    rows = Post.objects.order_by().values_list('id', 'text')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+    fill(rows.iterator(chunk_size=REBUILD_BATCH_SIZE))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0002_analyzed_terms'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_terms, migrations.RunPython.noop),
+    ]
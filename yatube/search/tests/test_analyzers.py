@@ -0,0 +1,85 @@
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, User
+from search.analyzers import Analyzer, RussianAnalyzer, stem_russian
+from search.backend import rebuild, snippet
+
+
+class RussianAnalyzerTest(SimpleTestCase):
+    def test_snowball_stems(self):
+        """Основы совпадают с эталонным словарём Snowball."""
+        stems = {
+            'вагонов': 'вагон',
+            'важнейшими': 'важн',
+            'ванной': 'ван',
+            'валялись': 'валя',
+            'вакансия': 'ваканс',
+            'важничаешь': 'важнича',
+            'вавилонский': 'вавилонск',
+            'гадость': 'гадост',
+            'бегающими': 'бега',
+            'красивейшая': 'красив',
+            'возможность': 'возможн',
+            'читавшая': 'чита',
+            'сказав': 'сказа',
+        }
+        self.assertEqual(
+            {word: stem_russian(word) for word in stems}, stems
+        )
+
+    def test_reflexive_perfective_gerund(self):
+        """Окончания деепричастий длиннее четырёх букв тоже отрезаются,
+        и деепричастие сводится к той же основе, что и глагол."""
+        for gerund, verb, stem in (
+            ('облокотившись', 'облокотился', 'облокот'),
+            ('умывшись', 'умылся', 'ум'),
+            ('испугавшись', 'испугался', 'испуга'),
+        ):
+            with self.subTest(gerund=gerund):
+                self.assertEqual(stem_russian(gerund), stem)
+                self.assertEqual(stem_russian(verb), stem)
+
+    def test_case_and_spelling_folding(self):
+        analyzer = RussianAnalyzer()
+        self.assertEqual(
+            analyzer.analyze('Ёлки ЕЛКАМИ, мѣсяцъ месяц Django'),
+            ['елк', 'елк', 'месяц', 'месяц', 'django']
+        )
+
+    def test_tokens_keep_positions(self):
+        text = 'Рыжие коты'
+        self.assertEqual(
+            [text[start:end] for start, end, term in
+             RussianAnalyzer().tokens(text)],
+            ['Рыжие', 'коты']
+        )
+
+    def test_snippet_marks_inflected_forms(self):
+        text = ' '.join(f'слово{i}' for i in range(30)) + ' Котами <b>'
+        self.assertEqual(
+            snippet(text, ['кот'], size=4),
+            '…слово28 слово29 <mark>Котами</mark> &lt;b&gt;'
+        )
+
+
+class PluggableAnalyzerTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+
+    def found(self, query):
+        response = self.client.get(reverse('search:search'), {'q': query})
+        return [post.pk for post, snippet in response.context['page_obj']]
+
+    def test_search_finds_other_word_forms(self):
+        post = Post.objects.create(author=self.user, text='Пришёл с котами')
+        self.assertEqual(self.found('кот пришел'), [post.pk])
+
+    @override_settings(SEARCH_ANALYZER='search.analyzers.Analyzer')
+    def test_analyzer_comes_from_settings(self):
+        post = Post.objects.create(author=self.user, text='Пришёл с котами')
+        rebuild()
+        self.assertEqual(self.found('кот'), [])
+        self.assertEqual(self.found('КОТАМИ'), [post.pk])
+        self.assertEqual(Analyzer().analyze('КОТАМИ'), ['котами'])
@@ -0,0 +1,94 @@
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, User
+from search.backend import match_expression
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+
+    def search(self, query, **params):
+        return self.client.get(
+            reverse('search:search'), {'q': query, **params}
+        )
+
+    def found(self, response):
+        return [post.pk for post, snippet in response.context['page_obj']]
+
+    def test_match_expression_is_safe(self):
+        self.assertEqual(
+            match_expression('Кот AND "NEAR(" -'), '"кот" "and" "near"'
+        )
+        self.assertEqual(match_expression(' !? '), '')
+
+    def test_index_follows_post_changes(self):
+        """Индекс обновляется при создании, правке и удалении поста."""
+        post = Post.objects.create(author=self.user, text='Рыжий кот')
+        self.assertEqual(self.found(self.search('кот')), [post.pk])
+        post.text = 'Рыжая собака'
+        post.save()
+        self.assertEqual(self.found(self.search('кот')), [])
+        self.assertEqual(self.found(self.search('собака')), [post.pk])
+        post.delete()
+        self.assertEqual(self.found(self.search('собака')), [])
+
+    def test_snippet_is_highlighted_and_escaped(self):
+        Post.objects.create(author=self.user, text='<b>кот</b> пришёл')
+        response = self.search('кот')
+        self.assertContains(response, '&lt;b&gt;<mark>кот</mark>&lt;/b&gt;')
+
+    def test_ranking_and_keyset_pages(self):
+        """Лучшие совпадения выше, страницы не пересекаются."""
+        best = Post.objects.create(author=self.user, text='кот кот кот')
+        others = [
+            Post.objects.create(
+                author=self.user, text=f'кот и много других слов {i}'
+            )
+            for i in range(12)
+        ]
+        first = self.search('кот')
+        first_ids = self.found(first)
+        self.assertEqual(len(first_ids), 10)
+        self.assertEqual(first_ids[0], best.pk)
+        second = self.search(
+            'кот', cursor=first.context['page_obj'].next_cursor
+        )
+        second_ids = self.found(second)
+        self.assertEqual(
+            sorted(first_ids + second_ids),
+            sorted([best.pk] + [post.pk for post in others])
+        )
+        self.assertIn('q=%D0%BA%D0%BE%D1%82&amp;cursor=',
+                      second.content.decode())
+
+    @override_settings(SEARCH_RANKED_MATCHES=3)
+    def test_broad_query_falls_back_to_recency(self):
+        """Слишком общий запрос не ранжируется, а идёт от новых к старым."""
+        posts = [
+            Post.objects.create(author=self.user, text='кот ' * (i + 1))
+            for i in range(4)
+        ]
+        self.assertEqual(
+            self.found(self.search('кот')),
+            [post.pk for post in reversed(posts)]
+        )
+
+    def test_admin_search_uses_index(self):
+        admin = User.objects.create_superuser('admin', 'a@a.a', 'pass')
+        client = Client()
+        client.force_login(admin)
+        posts = [
+            Post.objects.create(author=self.user, text=f'Зелёный лес {i}')
+            for i in range(5)
+        ]
+        Post.objects.create(author=self.user, text='Синее море')
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'лес'}
+        )
+        self.assertEqual(
+            sorted(obj.pk for obj in response.context['cl'].result_list),
+            [post.pk for post in posts]
+        )
@@ -0,0 +1,27 @@
+from django.shortcuts import render
+from django.utils.http import urlencode
+
+from core.utils import page_from_request
+from posts.models import Post
+
+from .backend import SearchPaginator, snippet
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    paginator = SearchPaginator(query, 10)
+    page_obj = page_from_request(request, paginator)
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        [hit.post_id for hit in page_obj.object_list]
+    )
+    found = [posts[hit.post_id] for hit in page_obj.object_list
+             if hit.post_id in posts]
+    page_obj.object_list = [
+        (post, snippet(post.text, paginator.terms)) for post in found
+    ]
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'extra_query': urlencode({'q': query}),
+    }
+    return render(request, 'search/results.html', context)
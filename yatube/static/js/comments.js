@@ -0,0 +1,114 @@
+// Подгрузка и отправка комментариев на странице поста. Без JS ссылка
+// «Ещё комментарии» просто открывает следующую страницу поста, а форма
+// отправляется обычным POST с редиректом.
+(function () {
+  'use strict';
+
+  function loadMore(link) {
+    if (link.dataset.loading) {
+      return;
+    }
+    link.dataset.loading = '1';
+    fetch(link.dataset.commentsMore, {
+      headers: {'X-Requested-With': 'XMLHttpRequest'},
+      credentials: 'same-origin'
+    }).then(function (response) {
+      if (!response.ok) {
+        throw new Error(response.status);
+      }
+      return response.text();
+    }).then(function (html) {
+      link.insertAdjacentHTML('beforebegin', html);
+      link.remove();
+      observeMore();
+    }).catch(function () {
+      window.location.href = link.href;
+    });
+  }
+
+  // Следующая пачка грузится, когда ссылка почти доскроллена.
+  var observer = 'IntersectionObserver' in window &&
+    new IntersectionObserver(function (entries) {
+      entries.forEach(function (entry) {
+        if (entry.isIntersecting) {
+          observer.unobserve(entry.target);
+          loadMore(entry.target);
+        }
+      });
+    }, {rootMargin: '200px'});
+
+  function observeMore() {
+    if (!observer) {
+      return;
+    }
+    document.querySelectorAll('[data-comments-more]').forEach(
+      function (link) {
+        observer.observe(link);
+      }
+    );
+  }
+
+  document.addEventListener('click', function (event) {
+    var link = event.target.closest('[data-comments-more]');
+    if (link) {
+      event.preventDefault();
+      loadMore(link);
+    }
+  });
+
+  function showErrors(form, errors) {
+    var box = form.querySelector('[data-comment-errors]');
+    if (!box) {
+      box = document.createElement('div');
+      box.className = 'alert alert-danger';
+      box.setAttribute('data-comment-errors', '');
+      form.prepend(box);
+    }
+    box.textContent = Object.keys(errors).map(function (field) {
+      return errors[field].join(' ');
+    }).join(' ');
+  }
+
+  document.addEventListener('submit', function (event) {
+    var form = event.target.closest('[data-comment-form]');
+    if (!form || form.dataset.sending) {
+      return;
+    }
+    event.preventDefault();
+    form.dataset.sending = '1';
+    fetch(form.action, {
+      method: 'POST',
+      body: new FormData(form),
+      headers: {'X-Requested-With': 'XMLHttpRequest'},
+      credentials: 'same-origin'
+    }).then(function (response) {
+      // Ответ без JSON (например, редирект на вход) — шлём форму как есть.
+      return response.json().then(function (data) {
+        return {ok: response.ok, data: data};
+      });
+    }).then(function (result) {
+      delete form.dataset.sending;
+      if (!result.ok) {
+        showErrors(form, result.data.errors);
+        return;
+      }
+      var errors = form.querySelector('[data-comment-errors]');
+      if (errors) {
+        errors.remove();
+      }
+      document.getElementById('comments').insertAdjacentHTML(
+        'afterbegin', result.data.html
+      );
+      document.querySelectorAll('[data-comment-count]').forEach(
+        function (counter) {
+          counter.textContent = result.data.count;
+        }
+      );
+      form.reset();
+    }).catch(function () {
+      form.submit();
+    });
+  });
+
+  observeMore();
+})();
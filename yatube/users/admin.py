@@ -0,0 +1,29 @@
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+
+from posts.export import export_response
+
+User = get_user_model()
+
+admin.site.unregister(User)
+
+
+@admin.register(User)
+class UserAdmin(BaseUserAdmin):
+    actions = ('export_ndjson', 'export_csv')
+
+    def export(self, request, queryset, export_format):
+        users = queryset.order_by('pk').values_list('pk', 'username')
+        return export_response(
+            users.iterator(), export_format, 'yatube-users',
+            request.build_absolute_uri
+        )
+
+    def export_ndjson(self, request, queryset):
+        return self.export(request, queryset, 'ndjson')
+    export_ndjson.short_description = 'Выгрузить посты и комментарии (NDJSON)'
+
+    def export_csv(self, request, queryset):
+        return self.export(request, queryset, 'csv')
+    export_csv.short_description = 'Выгрузить посты и комментарии (CSV)'
@@ -44,6 +44,8 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'posts.apps.PostsConfig',
     'core.apps.CoreConfig',
+    'search.apps.SearchConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -165,10 +167,93 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# LocMemCache живёт в памяти одного процесса. На нём держатся версии
+# кэша (core.cache), а по ним — ETag/Last-Modified и сброс фрагментов:
+# при нескольких процессах сервера изменение, сделанное в одном, другие
+# не видят. Поэтому LocMemCache годится только для одного процесса;
+# для нескольких нужен общий кэш, например
+# CACHE_BACKEND=django.core.cache.backends.memcached.MemcachedCache
+# и CACHE_LOCATION=127.0.0.1:11211.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
     }
 }
+# Сколько живут версии кэша. Если версии всё же разошлись между
+# процессами, устаревший ответ (и 304 на него) проживёт не дольше
+# этого срока; с общим кэшем его можно поднять до POST_LIST_CACHE_TIMEOUT
+CACHE_VERSION_TIMEOUT = 5 * 60
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+
+# Время жизни кэшированных списков постов; свежесть обеспечивают
+# версии в ключах (core.cache), поэтому TTL длинный
+POST_LIST_CACHE_TIMEOUT = 60 * 60
+# Отрисованные карточки постов сбрасываются точечно, см. posts.cards
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Сколько последних постов автора попадает в ленту подписок при подписке
+TIMELINE_BACKFILL = 1000
+# Посты авторов с большим числом подписчиков не раскладываются по лентам,
+# а читаются при открытии ленты. Обратно в push автор возвращается
+# командой rebalance_timelines, когда подписчиков стало меньше
+# TIMELINE_PUSH_THRESHOLD: зазор не даёт переключаться туда и обратно
+TIMELINE_PULL_THRESHOLD = 10000
+TIMELINE_PUSH_THRESHOLD = 8000
+TIMELINE_PULL_CACHE_TIMEOUT = 5 * 60
+
+# «Кого почитать» (posts.suggestions): сколько авторов хранить для
+# читателя, по скольким последним читателям автора искать близких ему
+# авторов и сколько близких авторов запоминать
+SUGGESTIONS_COUNT = 5
+SUGGESTIONS_SAMPLE = 1000
+SUGGESTIONS_SIMILAR = 50
+
+# «Популярное» (posts.trending): активность считается за скользящее окно
+# из корзин по TRENDING_BUCKET секунд; в корзине хранится не больше
+# TRENDING_CAPACITY самых активных объектов, показывается TRENDING_SIZE
+TRENDING_WINDOW = 60 * 60 * 24
+TRENDING_BUCKET = 60 * 60
+TRENDING_CAPACITY = 100
+TRENDING_SIZE = 5
+
+# Выгрузка данных пользователя (posts.export) читает строки из базы
+# кусками такого размера
+EXPORT_CHUNK_SIZE = 2000
+
+# Миниатюры картинок постов нарезаются сразу после загрузки
+# (posts.thumbnails): основной размер для <img src> и варианты по ширине
+# для srcset, в формате по умолчанию и в каждом современном формате,
+# который умеет писать установленный Pillow
+POST_THUMBNAIL_SIZE = (960, 339)
+POST_THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+POST_THUMBNAIL_WIDTHS = (480, 960, 1440)
+POST_THUMBNAIL_FORMATS = ('AVIF', 'WEBP')
+# Сколько процессов режут миниатюры; 0 — резать в процессе запроса
+THUMBNAIL_WORKERS = 1
+# Сколько после загрузки страницы показывают оригинал, ожидая рабочий
+# процесс; потом основной вариант режется на месте
+THUMBNAIL_PENDING_TIMEOUT = 5 * 60
+# Сколько найденных миниатюр каждый процесс держит в памяти
+THUMBNAIL_LRU_SIZE = 4096
+
+# Загруженные картинки ужимаются до этого размера по длинной стороне
+# и пересохраняются без EXIF (posts.images)
+IMAGE_MAX_SIDE = 2048
+IMAGE_JPEG_QUALITY = 85
+# Картинки с большим числом пикселей отклоняются до декодирования
+IMAGE_MAX_PIXELS = 50 * 1000 * 1000
+# Ширина заглушки картинки в пикселях (posts.images.make_placeholder)
+IMAGE_PLACEHOLDER_WIDTH = 16
+
+# Поиск ранжирует по bm25, только если совпадений и документов с каждым
+# словом не больше этих порогов, иначе показывает сначала новые посты
+# (search.backend)
+SEARCH_RANKED_MATCHES = 2000
+SEARCH_RANKED_TERM_DOCS = 50000
+# Анализатор, который режет тексты постов на термины для индекса и
+# запросов (search.analyzers). После смены — manage.py search_index
+SEARCH_ANALYZER = 'search.analyzers.RussianAnalyzer'